@@ -0,0 +1,134 @@
+import time
+import argparse
+import statistics
+
+from epic_table_parser import parse_html_tables, extract_page_tables, build_column_rows
+
+# Function to build a synthetic table page shaped like the EHITables pages
+def build_page(num_columns):
+    pk_rows = ''.join(f"<tr><td>COLUMN_{i}</td><td>{i}</td></tr>" for i in range(1, 3))
+    column_rows = ''.join(
+        f"<tr><td>{i}</td><td>COLUMN_{i}</td><td>VARCHAR</td><td>No</td></tr>"
+        f"<tr><td colspan='4'>Description for column {i}. It spans a continuation row.</td></tr>"
+        for i in range(1, num_columns + 1)
+    )
+    return (
+        "<html><body><h2>BENCHMARK_TABLE</h2>"
+        "<table><tr><td>Name</td><td>BENCHMARK_TABLE</td></tr></table>"
+        f"<table><tr><td>Column Name</td><td>Ordinal Position</td></tr>{pk_rows}</table>"
+        f"<table><tr><td>Ordinal</td><td>Column</td><td>Type</td><td>Discontinued?</td></tr>{column_rows}</table>"
+        "</body></html>"
+    )
+
+# Baseline: the original per-cell extraction, one inner_text() round-trip per cell
+def extract_per_cell(page, table_name):
+    tables = page.query_selector_all('table')
+
+    primary_keys = []
+    for table in tables:
+        header_row = table.query_selector('tr:first-child')
+        if not header_row:
+            continue
+        header_cells = header_row.query_selector_all('td')
+        header_text = ' '.join([cell.inner_text().strip() for cell in header_cells])
+        if 'Column Name' in header_text and 'Ordinal Position' in header_text:
+            for row in table.query_selector_all('tr:not(:first-child)'):
+                cells = row.query_selector_all('td')
+                if len(cells) >= 1:
+                    primary_keys.append(cells[0].inner_text().strip())
+            break
+
+    column_table = None
+    for table in tables:
+        rows = table.query_selector_all('tr:not(:first-child)')
+        if not rows:
+            continue
+        first_cell = rows[0].query_selector('td:first-child')
+        if first_cell and first_cell.inner_text().strip().isdigit():
+            column_table = table
+            break
+
+    table_data = []
+    descriptions = {}
+    current_column = None
+    for row in column_table.query_selector_all('tr:not(:first-child)'):
+        cells = row.query_selector_all('td')
+        if len(cells) >= 4 and cells[0].inner_text().strip().isdigit():
+            column_name = cells[1].inner_text().strip()
+            description = cells[4].inner_text().strip() if len(cells) > 4 else ""
+            current_column = column_name
+            descriptions[current_column] = description
+            table_data.append({
+                'table_name': table_name,
+                'column_name': column_name,
+                'primary_key': 'Y' if column_name in primary_keys else 'N',
+                'ordinal_position': cells[0].inner_text().strip(),
+                'type': cells[2].inner_text().strip(),
+                'discontinued': cells[3].inner_text().strip(),
+                'description': description
+            })
+        elif current_column and len(cells) > 0:
+            extra_text = row.inner_text().strip()
+            if extra_text:
+                if descriptions[current_column]:
+                    descriptions[current_column] += " " + extra_text
+                else:
+                    descriptions[current_column] = extra_text
+
+    for row in table_data:
+        row['description'] = descriptions.get(row['column_name'], '')
+    return table_data
+
+# Single round-trip extraction used by extract_table_data
+def extract_single_round_trip(page, table_name):
+    return build_column_rows(extract_page_tables(page), table_name)
+
+# Function to time a callable, returning the median latency in milliseconds
+def time_it(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Per-table extraction latency, per-cell vs single round-trip")
+    parser.add_argument('--columns', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-browser', action='store_true', help="Only time the in-process lxml parser")
+    args = parser.parse_args()
+
+    print(f"{'columns':>8} {'per-cell ms':>12} {'1 round-trip ms':>16} {'lxml ms':>9} {'speedup':>8}")
+
+    page = None
+    if not args.no_browser:
+        from playwright.sync_api import sync_playwright
+        playwright = sync_playwright().start()
+        browser = playwright.chromium.launch(headless=True)
+        page = browser.new_page()
+
+    try:
+        for num_columns in args.columns:
+            html = build_page(num_columns)
+            lxml_ms = time_it(lambda: build_column_rows(parse_html_tables(html), 'BENCHMARK_TABLE'), args.repeat)
+
+            if page is None:
+                print(f"{num_columns:>8} {'-':>12} {'-':>16} {lxml_ms:>9.2f} {'-':>8}")
+                continue
+
+            page.set_content(html)
+            # Both paths must produce identical rows before their timings are comparable
+            assert extract_per_cell(page, 'BENCHMARK_TABLE') == extract_single_round_trip(page, 'BENCHMARK_TABLE')
+
+            per_cell_ms = time_it(lambda: extract_per_cell(page, 'BENCHMARK_TABLE'), args.repeat)
+            single_ms = time_it(lambda: extract_single_round_trip(page, 'BENCHMARK_TABLE'), args.repeat)
+            print(f"{num_columns:>8} {per_cell_ms:>12.1f} {single_ms:>16.1f} {lxml_ms:>9.2f} {per_cell_ms / single_ms:>7.1f}x")
+    finally:
+        if page is not None:
+            browser.close()
+            playwright.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+# Commands timed end to end as fresh processes, the way a user runs them
+COMMANDS = [
+    ('interpreter', ['-c', 'pass']),
+    ('pandas + playwright', ['-c', 'import pandas, playwright.sync_api']),
+    ('epic_dict status', ['epic_dict.py', 'status']),
+    ('epic_dict lookup pk', ['epic_dict.py', 'lookup', 'pk', 'ABN_DOCUMENT_ID']),
+    ('epic_dict lookup column', ['epic_dict.py', 'lookup', 'column', 'PAT_ENC_CSN_ID']),
+    ('epic_dict lookup search', ['epic_dict.py', 'lookup', 'search', 'encounter csn']),
+    ('epic_dict lookup fuzzy', ['epic_dict.py', 'lookup', 'fuzzy', 'ABN_DOCUMNT_ID']),
+]
+
+# Function to time a command in a fresh interpreter, median wall time in ms
+def time_command(arguments, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable] + arguments, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            return None
+    return statistics.median(timings)
+
+# Function to list the slowest top-level imports of a command
+def slowest_imports(arguments, count):
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + arguments,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Top-level imports are the ones not indented under another module
+        if not name.startswith('  '):
+            imports.append((int(cumulative) / 1000, name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Process startup time of the epic_dict subcommands")
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--imports', type=int, default=0, metavar='N',
+                        help="Also list the N slowest top-level imports of each epic_dict command")
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'command':26} {'median ms':>10} {'over python':>12}")
+    for label, arguments in COMMANDS:
+        median_ms = time_command(arguments, args.repeat)
+        if median_ms is None:
+            print(f"{label:26} {'failed':>10}")
+            continue
+        if baseline is None:
+            baseline = median_ms
+        print(f"{label:26} {median_ms:>10.1f} {median_ms - baseline:>12.1f}")
+        if args.imports and arguments[0] == 'epic_dict.py':
+            for cumulative_ms, name in slowest_imports(arguments, args.imports):
+                print(f"    {name:22} {cumulative_ms:>10.1f}")
+
+if __name__ == "__main__":
+    main()
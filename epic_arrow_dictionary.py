@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import argparse
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+
+from epic_log import log
+from epic_data_dictionary import source_files, source_signatures
+from epic_parquet_export import LETTER_FILE, read_letter_csv
+from epic_pk_writer import LETTER_FILE as PK_LETTER_FILE
+
+# Single-file Arrow IPC (Feather v2) copy of the whole dictionary.
+#
+# One row per column from epic_data_tables/{letter}.csv, plus the letter and
+# pk_ordinal_position from epic_data_primary_keys/pk_{letter}.csv (null for
+# columns that are not part of the primary key). Primary key columns missing
+# from the column files are kept as rows of their own.
+#
+# The file is written uncompressed so it can be memory-mapped: load_mapped()
+# returns a table whose buffers point straight into the page cache, so any
+# number of processes share one copy and startup costs no parsing.
+#
+# The size and mtime of every source file are stored in the schema metadata,
+# which lets is_stale() tell when the file needs rebuilding.
+
+DICTIONARY_FILE = 'epic_dictionary.arrow'
+SOURCES_KEY = b'epic.sources'
+
+_PK_SCHEMA = pa.schema([
+    ('table_name', pa.string()),
+    ('column_name', pa.string()),
+    ('is_primary_key', pa.string()),
+    ('ordinal_position', pa.int32()),
+])
+_PK_PARSE_OPTIONS = pa_csv.ParseOptions(newlines_in_values=True)
+_PK_CONVERT_OPTIONS = pa_csv.ConvertOptions(column_types=_PK_SCHEMA, strings_can_be_null=False)
+
+# Function to read every letter file of one kind into one table, with a letter column in front
+def _read_letters(directory, pattern, read):
+    tables = []
+    for letter, path in source_files(directory, pattern):
+        table = read(path)
+        tables.append(table.add_column(0, 'letter', pa.array([letter] * table.num_rows, pa.string())))
+    return pa.concat_tables(tables)
+
+# Function to join the column and primary key files into one table, keeping index order
+def build_table(tables_dir, pk_dir):
+    columns = _read_letters(tables_dir, LETTER_FILE, read_letter_csv)
+    primary_keys = _read_letters(
+        pk_dir, PK_LETTER_FILE,
+        lambda path: pa_csv.read_csv(path, parse_options=_PK_PARSE_OPTIONS, convert_options=_PK_CONVERT_OPTIONS)
+    )
+
+    columns = columns.append_column('_row', pa.array(range(columns.num_rows), pa.int64()))
+    primary_keys = primary_keys.select(['letter', 'table_name', 'column_name', 'ordinal_position']) \
+                               .rename_columns(['pk_letter', 'table_name', 'column_name', 'pk_ordinal_position'])
+    joined = columns.join(primary_keys, keys=['table_name', 'column_name'], join_type='full outer')
+
+    # Key-only rows (no column file entry) sort last and take their letter from the PK file
+    joined = joined.sort_by([('_row', 'ascending'), ('pk_letter', 'ascending'), ('table_name', 'ascending')])
+    letter = pc.coalesce(joined.column('letter'), joined.column('pk_letter'))
+    joined = joined.set_column(joined.schema.get_field_index('letter'), 'letter', letter)
+    return joined.drop_columns(['_row', 'pk_letter'])
+
+# Function to build the IPC file atomically
+def build_dictionary_file(tables_dir='epic_data_tables', pk_dir='epic_data_primary_keys', path=DICTIONARY_FILE):
+    signatures = source_signatures(tables_dir, pk_dir)
+    table = build_table(tables_dir, pk_dir)
+    table = table.replace_schema_metadata({SOURCES_KEY: json.dumps(signatures).encode()})
+
+    tmp_path = path + '.tmp'
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    log(f"Wrote {table.num_rows} rows from {len(signatures)} files to {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    return table.num_rows
+
+# Function to memory-map the dictionary file; no data is copied or parsed
+def load_mapped(path=DICTIONARY_FILE):
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+# Function to check whether the source files changed since the file was built
+def is_stale(path=DICTIONARY_FILE, tables_dir='epic_data_tables', pk_dir='epic_data_primary_keys'):
+    if not os.path.exists(path):
+        return True
+    with pa.memory_map(path, 'r') as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    built_from = json.loads(metadata.get(SOURCES_KEY, b'{}'))
+    return built_from != source_signatures(tables_dir, pk_dir)
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mappable Arrow IPC copy of the column and primary key files")
+    parser.add_argument('--tables-dir', default='epic_data_tables')
+    parser.add_argument('--pk-dir', default='epic_data_primary_keys')
+    parser.add_argument('--output', default=DICTIONARY_FILE)
+    parser.add_argument('--if-stale', action='store_true', help="Only rebuild when a source file changed")
+    parser.add_argument('--load', action='store_true', help="Time a memory-mapped load afterwards")
+    args = parser.parse_args()
+
+    if args.if_stale and not is_stale(args.output, args.tables_dir, args.pk_dir):
+        log(f"{args.output} is up to date")
+    else:
+        build_dictionary_file(args.tables_dir, args.pk_dir, args.output)
+
+    if args.load:
+        start = time.perf_counter()
+        table = load_mapped(args.output)
+        log(f"Mapped {table.num_rows} rows in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+import os
+import csv
+import asyncio
+import argparse
+from playwright.async_api import async_playwright
+from datetime import datetime
+
+from epic_letter_writer import LetterWriter
+from epic_log import log
+from epic_data_scraper_alphabetical import (
+    columns,
+    crawl_state,
+    load_progress,
+    save_progress,
+    build_table_list,
+    group_tables_by_letter,
+)
+from epic_rate_limiter import AimdRateLimiter
+from epic_snapshot_store import SnapshotStore
+from epic_page_profile import LeanPageProfile, ensure_summary_header
+from epic_parquet_export import write_letter_partition
+from epic_table_parser import extract_page_tables_async, build_column_rows
+
+INDEX_URL = "https://open.epic.com/EHITables/GetTable/_index.htm"
+
+# Function to extract data from a table page (asyncio version of extract_table_data)
+async def extract_table_data_async(page, table_name, url, snapshot_store=None, rate_limiter=None, page_profile=None):
+    try:
+        log(f"Processing table: {table_name}")
+
+        if page_profile:
+            # Load only the HTML document and wait for the tables, not the network
+            await page_profile.load_async(page, url, rate_limiter)
+        else:
+            # Navigate with a timeout and wait until network is idle, paced by the rate limiter
+            if rate_limiter:
+                await rate_limiter.goto_async(page, url, timeout=60000, wait_until='networkidle')
+            else:
+                await page.goto(url, timeout=60000, wait_until='networkidle')
+
+            # Wait for page content to load
+            await page.wait_for_selector('table', timeout=10000)
+
+        # Keep the raw HTML so the page can be re-parsed later without re-crawling
+        if snapshot_store:
+            snapshot_store.put(table_name, url, await page.content())
+
+        # Pull every table's header and rows out of the page in one round-trip
+        tables = await extract_page_tables_async(page)
+
+        if not tables:
+            log(f"No tables found on the page for {table_name}. Skipping.")
+            return []
+
+        # Match primary keys, merge continuation descriptions and find the column table in Python
+        table_data = build_column_rows(tables, table_name)
+        if not table_data:
+            log(f"Could not find any suitable column information table for {table_name}. Skipping table.")
+            return []
+
+        log(f"Successfully extracted {len(table_data)} columns for table {table_name}")
+        return table_data
+
+    except Exception as e:
+        log(f"Error processing table {table_name}: {e}")
+        return []
+
+# Pool of reusable pages spread across one or more browser contexts
+class PagePool:
+    def __init__(self, browser, contexts=2, pages_per_context=4, lean=True):
+        self.browser = browser
+        self.num_contexts = contexts
+        self.pages_per_context = pages_per_context
+        self.lean = lean
+        self.contexts = []
+        self.pages = asyncio.Queue()
+        # Each page keeps its own lean profile, since load stats are collected per page
+        self.profiles = {}
+
+    async def start(self):
+        for _ in range(self.num_contexts):
+            context = await self.browser.new_context()
+            self.contexts.append(context)
+            for _ in range(self.pages_per_context):
+                page = await context.new_page()
+                if self.lean:
+                    self.profiles[page] = LeanPageProfile()
+                    await self.profiles[page].apply_async(page)
+                await self.pages.put(page)
+        log(f"Page pool ready: {self.num_contexts} contexts x {self.pages_per_context} pages")
+
+    async def acquire(self):
+        return await self.pages.get()
+
+    async def release(self, page):
+        await self.pages.put(page)
+
+    async def close(self):
+        for context in self.contexts:
+            await context.close()
+
+# Function to load and group the table index
+async def load_table_index(page, alphabet):
+    log(f"Loading index page: {INDEX_URL}")
+    await page.goto(INDEX_URL, timeout=60000, wait_until='networkidle')
+    await page.wait_for_selector('a')
+
+    # Pull every link's href and text in a single call
+    links = await page.eval_on_selector_all(
+        'a[href*=".htm"]',
+        "els => els.map(el => [el.getAttribute('href'), el.innerText])"
+    )
+    log(f"Found {len(links)} potential links")
+
+    all_tables = build_table_list(links)
+    log(f"Found {len(all_tables)} unique tables")
+    return group_tables_by_letter(all_tables, alphabet)
+
+# Function to crawl one table with a page from the pool, bounded by the global cap
+async def crawl_table(pool, semaphore, letter, table_name, url, output_dir, snapshot_store=None, rate_limiter=None):
+    async with semaphore:
+        page = await pool.acquire()
+        table_start_time = datetime.now()
+        page_profile = pool.profiles.get(page)
+        status, error, table_data = "No Data", "", []
+        try:
+            table_data = await extract_table_data_async(page, table_name, url, snapshot_store, rate_limiter, page_profile)
+            if table_data:
+                status = "Success"
+        except Exception as e:
+            status, error = "Error", str(e)
+            log(f"  ✗ Error processing table {table_name}: {e}")
+        finally:
+            profile_values = page_profile.summary_values() if page_profile else ['', '']
+            await pool.release(page)
+
+        # Update summary file - rows are appended from the event loop thread only
+        processing_time = (datetime.now() - table_start_time).total_seconds()
+        with open(os.path.join(output_dir, 'processing_summary.csv'), 'a', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([letter, table_name, len(table_data), status, error, processing_time] + profile_values)
+        crawl_state(output_dir).record_table(letter, table_name, status, len(table_data), error, processing_time, url)
+
+        return table_data
+
+# Process all tables for a letter concurrently
+async def process_letter_tables_async(pool, semaphore, letter, letter_tables, output_dir, snapshot_store=None, rate_limiter=None):
+    log(f"PROCESSING LETTER '{letter}' - {len(letter_tables)} tables")
+
+    # Rows are streamed to {letter}.csv.partial as tables finish; a rerun skips tables already in it
+    writer = LetterWriter(os.path.join(output_dir, f"{letter}.csv"), columns)
+    written_tables = writer.open()
+    letter_tables = [(name, url) for name, url in letter_tables if name not in written_tables]
+
+    async def crawl_and_write(position, table_name, url):
+        table_data = await crawl_table(pool, semaphore, letter, table_name, url, output_dir, snapshot_store, rate_limiter)
+        # Held back until the tables before it are written, to keep the index order
+        writer.add(position, table_name, table_data)
+        return bool(table_data)
+
+    results = await asyncio.gather(*[
+        crawl_and_write(position, table_name, url)
+        for position, (table_name, url) in enumerate(letter_tables)
+    ])
+    total_success = sum(results)
+    total_error = len(results) - total_success
+
+    # Move the finished letter file into place
+    total_rows = writer.finalize()
+    if total_rows:
+        log(f"Saved {total_rows} columns to {writer.letter_file}")
+    else:
+        log(f"No data extracted for letter '{letter}'. CSV file not created.")
+    write_letter_partition(output_dir, letter)
+
+    log(f"Letter '{letter}' processing complete: {total_success} successful, {total_error} failed")
+    return total_success, total_error
+
+# Async crawl of every pending letter over a shared page pool
+async def crawl(output_dir, contexts, pages_per_context, concurrency, headless, snapshot_store=None, rate_limiter=None, lean=True):
+    os.makedirs(output_dir, exist_ok=True)
+    alphabet = list('ABCDEFGHIJKLMNOPQRSTUVWXYZ') + ['SPECIAL']
+    processed_letters, _ = load_progress(output_dir)
+
+    # Create summary file header if doesn't exist
+    summary_file = os.path.join(output_dir, 'processing_summary.csv')
+    ensure_summary_header(summary_file, ['Letter', 'Table_Name', 'Column_Count', 'Status', 'Error', 'Processing_Time'])
+
+    async with async_playwright() as p:
+        log("Launching browser...")
+        browser = await p.chromium.launch(headless=headless)
+        pool = PagePool(browser, contexts, pages_per_context, lean)
+        try:
+            await pool.start()
+
+            index_page = await pool.acquire()
+            letter_groups = await load_table_index(index_page, alphabet)
+            await pool.release(index_page)
+
+            pending = [letter for letter in alphabet
+                       if letter not in processed_letters and letter_groups.get(letter)]
+            log(f"Pending letters: {pending}")
+
+            # The semaphore caps in-flight page loads across all letters
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def run_letter(letter):
+                result = await process_letter_tables_async(
+                    pool, semaphore, letter, letter_groups[letter], output_dir, snapshot_store, rate_limiter
+                )
+                processed_letters.add(letter)
+                save_progress(output_dir, processed_letters)
+                return result
+
+            start_time = datetime.now()
+            results = await asyncio.gather(*[run_letter(letter) for letter in pending])
+
+            total_success = sum(success for success, _ in results)
+            total_error = sum(error for _, error in results)
+            elapsed = (datetime.now() - start_time).total_seconds()
+            log("="*70)
+            log("PROCESSING COMPLETE")
+            if rate_limiter:
+                rate_limiter.log_stats()
+            log(f"{total_success} tables successful, {total_error} failed in {elapsed:.1f}s")
+            log(f"Results saved to {output_dir}/ folder")
+            log("="*70)
+        finally:
+            await pool.close()
+            log("Closing browser...")
+            await browser.close()
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent Epic EHI tables crawler")
+    parser.add_argument('--output-dir', default='epic_data_tables')
+    parser.add_argument('--contexts', type=int, default=2, help="Number of browser contexts")
+    parser.add_argument('--pages-per-context', type=int, default=4, help="Pages opened in each context")
+    parser.add_argument('--concurrency', type=int, default=8, help="Global cap on in-flight page loads")
+    parser.add_argument('--headed', action='store_true', help="Show the browser window")
+    parser.add_argument('--max-rate', type=float, default=50.0, help="Upper bound on page loads/second")
+    parser.add_argument('--snapshot-dir', default='epic_html_snapshots')
+    parser.add_argument('--no-snapshot', action='store_true', help="Do not store fetched pages")
+    parser.add_argument('--full-page-load', action='store_true',
+                        help="Load every page resource and wait for network idle instead of the lean profile")
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print("EPIC EHI TABLES DATA EXTRACTION - CONCURRENT")
+    print(f"{args.contexts} contexts x {args.pages_per_context} pages, concurrency {args.concurrency}")
+    print("="*70 + "\n")
+
+    asyncio.run(crawl(
+        args.output_dir,
+        args.contexts,
+        args.pages_per_context,
+        args.concurrency,
+        headless=not args.headed,
+        snapshot_store=None if args.no_snapshot else SnapshotStore(args.snapshot_dir),
+        rate_limiter=AimdRateLimiter(max_rate=args.max_rate),
+        lean=not args.full_page_load,
+    ))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import struct
+import argparse
+import numpy as np
+
+from epic_log import log
+from epic_arrow_dictionary import build_table, source_signatures
+
+# Reverse index from column name to the tables that carry it.
+#
+# epic_column_index.bin is a single file that is memory-mapped as a whole:
+#
+#   b'EPICCIX1' | uint64 header length | JSON header | padding | arrays
+#
+# The JSON header lists the column names (sorted), table names, types, the
+# source file signatures and where each array starts. Two arrays follow:
+#
+#   column_offsets  int32[columns + 1]   postings of column i are
+#                                        postings[column_offsets[i]:column_offsets[i + 1]]
+#   postings        (table int32, ordinal_position int32, type int16, is_pk int8)
+#                   sorted by column, then table
+#
+# The index is built in one vectorized pass over the letter files. It records
+# their sizes and mtimes, so a rewritten letter makes the index stale and
+# open_index() rebuilds it before use.
+
+COLUMN_INDEX_FILE = 'epic_column_index.bin'
+MAGIC = b'EPICCIX1'
+POSTING_DTYPE = np.dtype([('table', '<i4'), ('ordinal_position', '<i4'), ('type', '<i2'), ('is_pk', 'i1')])
+
+# Function to build the reverse index and write it atomically
+def build_column_index(tables_dir='epic_data_tables', pk_dir='epic_data_primary_keys', path=COLUMN_INDEX_FILE):
+    signatures = source_signatures(tables_dir, pk_dir)
+    dictionary = build_table(tables_dir, pk_dir)
+    # Primary key columns missing from the column files have no type or position
+    table_names = dictionary.column('table_name').to_numpy(zero_copy_only=False).astype(str)
+    column_names = dictionary.column('column_name').to_numpy(zero_copy_only=False).astype(str)
+    type_names = dictionary.column('type').fill_null('').to_numpy(zero_copy_only=False).astype(str)
+    ordinals = dictionary.column('ordinal_position').fill_null(0).to_numpy()
+    is_pk = dictionary.column('pk_ordinal_position').is_valid().to_numpy(zero_copy_only=False)
+
+    columns, column_ids = np.unique(column_names, return_inverse=True)
+    tables, table_ids = np.unique(table_names, return_inverse=True)
+    types, type_ids = np.unique(type_names, return_inverse=True)
+
+    order = np.lexsort((table_ids, column_ids))
+    postings = np.empty(len(order), dtype=POSTING_DTYPE)
+    postings['table'] = table_ids[order]
+    postings['ordinal_position'] = ordinals[order]
+    postings['type'] = type_ids[order]
+    postings['is_pk'] = is_pk[order]
+    column_offsets = np.zeros(len(columns) + 1, dtype='<i4')
+    np.cumsum(np.bincount(column_ids, minlength=len(columns)), out=column_offsets[1:])
+
+    # Array offsets are relative to the end of the padded header
+    arrays = {'column_offsets': (column_offsets, 0)}
+    arrays['postings'] = (postings, -(-column_offsets.nbytes // 8) * 8)
+    header = {
+        'columns': columns.tolist(),
+        'tables': tables.tolist(),
+        'types': types.tolist(),
+        'sources': signatures,
+        'arrays': {name: {'offset': offset, 'length': len(array)} for name, (array, offset) in arrays.items()},
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    prefix_length = len(MAGIC) + 8 + len(header_bytes)
+    padding = -prefix_length % 8
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', len(header_bytes)) + header_bytes + b'\0' * padding)
+        for array, offset in arrays.values():
+            f.seek(prefix_length + padding + offset)
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+    log(f"Wrote {path}: {len(columns)} columns, {len(tables)} tables, {len(postings)} postings "
+        f"({os.path.getsize(path) / 1e6:.1f} MB)")
+
+class ColumnIndex:
+    def __init__(self, path=COLUMN_INDEX_FILE):
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(self.data[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a column index file")
+        header_length, = struct.unpack('<Q', bytes(self.data[len(MAGIC):len(MAGIC) + 8]))
+        header_end = len(MAGIC) + 8 + header_length
+        header = json.loads(bytes(self.data[len(MAGIC) + 8:header_end]))
+        base = header_end + (-header_end % 8)
+
+        self.columns = header['columns']
+        self.tables = header['tables']
+        self.types = header['types']
+        self.sources = header['sources']
+        self.column_ids = {name: position for position, name in enumerate(self.columns)}
+        self.table_ids = {name: position for position, name in enumerate(self.tables)}
+        self.column_offsets = self._array(base, header['arrays']['column_offsets'], np.dtype('<i4'))
+        self.postings = self._array(base, header['arrays']['postings'], POSTING_DTYPE)
+
+    def _array(self, base, spec, dtype):
+        start = base + spec['offset']
+        return self.data[start:start + spec['length'] * dtype.itemsize].view(dtype)
+
+    def is_stale(self, tables_dir='epic_data_tables', pk_dir='epic_data_primary_keys'):
+        return self.sources != source_signatures(tables_dir, pk_dir)
+
+    def _postings(self, column_name):
+        column = self.column_ids.get(column_name)
+        if column is None:
+            return self.postings[:0]
+        return self.postings[self.column_offsets[column]:self.column_offsets[column + 1]]
+
+    def table_count(self, column_name):
+        column = self.column_ids.get(column_name)
+        return 0 if column is None else int(self.column_offsets[column + 1] - self.column_offsets[column])
+
+    def tables_with_column(self, column_name):
+        """Return [(table_name, ordinal_position, type, is_pk), ...] sorted by table name"""
+        return [(self.tables[table], ordinal, self.types[type_id], bool(is_pk))
+                for table, ordinal, type_id, is_pk in self._postings(column_name).tolist()]
+
+    def lookup(self, table_name, column_name):
+        """Return (ordinal_position, type, is_pk) of a column in a table, or None"""
+        table = self.table_ids.get(table_name)
+        postings = self._postings(column_name)
+        if table is None or not len(postings):
+            return None
+        position = int(np.searchsorted(postings['table'], table))
+        if position == len(postings) or postings['table'][position] != table:
+            return None
+        _, ordinal, type_id, is_pk = postings[position].tolist()
+        return ordinal, self.types[type_id], bool(is_pk)
+
+    def __contains__(self, column_name):
+        return column_name in self.column_ids
+
+# Function to open the index, rebuilding it first when it is missing or stale
+def open_index(path=COLUMN_INDEX_FILE, tables_dir='epic_data_tables', pk_dir='epic_data_primary_keys'):
+    if os.path.exists(path):
+        index = ColumnIndex(path)
+        if not index.is_stale(tables_dir, pk_dir):
+            return index
+        log(f"{path} is older than the letter files, rebuilding it")
+    build_column_index(tables_dir, pk_dir, path)
+    return ColumnIndex(path)
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the column name reverse index")
+    parser.add_argument('--index', default=COLUMN_INDEX_FILE)
+    parser.add_argument('--tables-dir', default='epic_data_tables')
+    parser.add_argument('--pk-dir', default='epic_data_primary_keys')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('build', help="Rebuild the index from the letter files")
+    subparsers.add_parser('column', help="Tables that carry a column").add_argument('name')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_column_index(args.tables_dir, args.pk_dir, args.index)
+        return
+
+    start = time.perf_counter()
+    index = open_index(args.index, args.tables_dir, args.pk_dir)
+    opened = time.perf_counter()
+    postings = index.tables_with_column(args.name)
+    elapsed = time.perf_counter() - opened
+    for table_name, ordinal, type_name, is_pk in postings:
+        print(f"{table_name:40} {ordinal:>4}  {type_name:12} {'PK' if is_pk else ''}")
+    log(f"{len(postings)} tables; opened in {(opened - start) * 1000:.1f} ms, queried in {elapsed * 1e6:.0f} us")
+
+if __name__ == "__main__":
+    main()
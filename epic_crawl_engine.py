@@ -0,0 +1,368 @@
+import os
+import csv
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from lxml.etree import LxmlError
+
+import epic_data_scraper_alphabetical
+import epic_primary_key_scraper
+from epic_incremental_refresh import rewrite_letter_file
+from epic_letter_writer import LetterWriter
+from epic_log import log
+from epic_description_store import build_normalized
+from epic_data_scraper_alphabetical import crawl_state, load_progress, save_progress, build_table_list, group_tables_by_letter
+from epic_http_fetcher import INDEX_URL, HttpTableFetcher, PageParseError
+from epic_pk_writer import PrimaryKeyWriter
+from epic_page_profile import LeanPageProfile, ensure_summary_header
+from epic_parquet_export import write_letter_partition
+from epic_rate_limiter import AimdRateLimiter
+from epic_snapshot_store import SnapshotStore
+from epic_table_parser import extract_page_tables, build_column_rows, build_primary_key_rows
+
+# One crawl fetches each table page once and writes both outputs from the
+# same parsed tables:
+#
+#   {tables_dir}/{letter}.csv       + processing_summary.csv
+#   {pk_dir}/pk_{letter}.csv        + pk_processing_summary.csv
+#   {state_dir}/crawl_state.db      - the single checkpoint for both
+
+ALPHABET = list('ABCDEFGHIJKLMNOPQRSTUVWXYZ') + ['SPECIAL']
+
+# Last statuses that --resume retries; successful tables are never revisited
+RETRY_STATUSES = ('Error', 'Parse Error', 'No Data')
+
+# Playwright page source; Chromium is only launched on first use so it can also serve as a fallback
+class BrowserPageSource:
+    def __init__(self, headless=True, snapshot_store=None, rate_limiter=None, lean=True):
+        self.headless = headless
+        self.snapshot_store = snapshot_store
+        self.rate_limiter = rate_limiter
+        self.page_profile = LeanPageProfile() if lean else None
+        self.playwright = None
+        self.browser = None
+        self.page = None
+
+    def _start(self):
+        if self.page is None:
+            from playwright.sync_api import sync_playwright
+            log("Launching browser...")
+            self.playwright = sync_playwright().start()
+            self.browser = self.playwright.chromium.launch(headless=self.headless)
+            self.page = self.browser.new_context().new_page()
+            if self.page_profile:
+                self.page_profile.apply(self.page)
+        return self.page
+
+    def list_tables(self):
+        page = self._start()
+        log(f"Loading index page: {INDEX_URL}")
+        page.goto(INDEX_URL, timeout=60000, wait_until='networkidle')
+        page.wait_for_selector('a')
+        links = page.eval_on_selector_all(
+            'a[href*=".htm"]',
+            "els => els.map(el => [el.getAttribute('href'), el.innerText])"
+        )
+        return build_table_list(links)
+
+    def fetch_tables(self, table_name, url):
+        page = self._start()
+        if self.page_profile:
+            self.page_profile.load(page, url, self.rate_limiter)
+        else:
+            if self.rate_limiter:
+                self.rate_limiter.goto(page, url, timeout=60000, wait_until='networkidle')
+            else:
+                page.goto(url, timeout=60000, wait_until='networkidle')
+            page.wait_for_selector('table', timeout=10000)
+        if self.snapshot_store:
+            self.snapshot_store.put(table_name, url, page.content())
+        return extract_page_tables(page)
+
+    def close(self):
+        if self.browser is not None:
+            self.browser.close()
+            self.playwright.stop()
+
+# HTTP page source over pooled keep-alive connections
+class HttpPageSource:
+    page_profile = None
+
+    def __init__(self, workers=16, snapshot_store=None, rate_limiter=None):
+        self.fetcher = HttpTableFetcher(pool_size=workers, snapshot_store=snapshot_store, rate_limiter=rate_limiter)
+
+    def list_tables(self):
+        return self.fetcher.fetch_index()
+
+    def fetch_tables(self, table_name, url):
+        return self.fetcher.fetch_tables(table_name, url)
+
+    def close(self):
+        self.fetcher.close()
+
+# Function to fetch and parse one page into both outputs
+def crawl_table(source, table_name, url):
+    """Return (column rows, pk rows, status, error, seconds, profile values)"""
+    start_time = datetime.now()
+    try:
+        tables = source.fetch_tables(table_name, url)
+        column_rows = build_column_rows(tables, table_name)
+        pk_rows = build_primary_key_rows(tables, table_name)
+        status, error = ("Success" if column_rows else "No Data"), ""
+    except (PageParseError, LxmlError) as e:
+        # An empty or garbled body (lxml raises ParserError) goes to the browser fallback too
+        column_rows, pk_rows, status, error = [], [], "Parse Error", str(e) or type(e).__name__
+    except Exception as e:
+        column_rows, pk_rows, status, error = [], [], "Error", str(e)
+    profile_values = source.page_profile.summary_values() if source.page_profile else ['', '']
+    return column_rows, pk_rows, status, error, (datetime.now() - start_time).total_seconds(), profile_values
+
+# Function to append a row to a summary file
+def append_summary(summary_file, row):
+    with open(summary_file, 'a', newline='') as f:
+        csv.writer(f).writerow(row)
+
+# Function to create or widen the headers of both summary files
+def ensure_summaries(tables_dir, pk_dir):
+    ensure_summary_header(os.path.join(tables_dir, 'processing_summary.csv'),
+                          ['Letter', 'Table_Name', 'Column_Count', 'Status', 'Error', 'Processing_Time'])
+    ensure_summary_header(os.path.join(pk_dir, 'pk_processing_summary.csv'),
+                          ['Letter', 'Table_Name', 'PK_Column_Count', 'Status', 'Error', 'Processing_Time'])
+
+# Function to record one table's outcome in the crawl state and both summary files
+def record_table(letter, table_name, url, result, tables_dir, pk_dir, state_dir):
+    column_rows, pk_rows, status, error, processing_time, profile_values = result
+    crawl_state(state_dir).record_table(letter, table_name, status, len(column_rows), error, processing_time, url)
+    append_summary(os.path.join(tables_dir, 'processing_summary.csv'),
+                   [letter, table_name, len(column_rows), status, error, processing_time] + profile_values)
+    pk_status = status if status not in ("Success", "No Data") else ("Success" if pk_rows else "No Data")
+    append_summary(os.path.join(pk_dir, 'pk_processing_summary.csv'),
+                   [letter, table_name, len(pk_rows), pk_status, error, processing_time] + profile_values)
+
+# Function to open the streaming column and primary key writers for a letter
+def open_letter_writers(letter, tables_dir, pk_dir):
+    """Return (column writer, pk writer, tables already written by an interrupted run)"""
+    column_writer = LetterWriter(os.path.join(tables_dir, f"{letter}.csv"), epic_data_scraper_alphabetical.columns)
+    pk_writer = LetterWriter(os.path.join(pk_dir, f"pk_{letter}.csv"), epic_primary_key_scraper.columns)
+    # A table counts as written once its column rows are in; primary keys are appended first
+    written_tables = column_writer.open()
+    pk_writer.open(keep=written_tables)
+    if written_tables:
+        log(f"Skipping {len(written_tables)} tables already written for letter '{letter}'")
+    return column_writer, pk_writer, written_tables
+
+# Function to append one table's rows to both writers, optionally in index position order
+def append_table(column_writer, pk_writer, table_name, column_rows, pk_rows, position=None):
+    if position is None:
+        pk_writer.append(table_name, pk_rows)
+        column_writer.append(table_name, column_rows)
+    else:
+        pk_writer.add(position, table_name, pk_rows)
+        column_writer.add(position, table_name, column_rows)
+
+# Function to move one letter's finished column and primary key files into place
+def finalize_letter_writers(column_writer, pk_writer):
+    for writer, unit in ((pk_writer, 'primary key columns'), (column_writer, 'columns')):
+        total_rows = writer.finalize()
+        if total_rows:
+            log(f"Saved {total_rows} {unit} to {writer.letter_file}")
+    # The Parquet partition follows the column file
+    tables_dir, file_name = os.path.split(column_writer.letter_file)
+    write_letter_partition(tables_dir, os.path.splitext(file_name)[0])
+
+# Function to crawl a list of tables in order, yielding (table_name, url, result)
+def crawl_tables(source, fallback, executor, tables):
+    if executor is not None:
+        results = executor.map(lambda table: crawl_table(source, *table), tables)
+    else:
+        results = (crawl_table(source, table_name, url) for table_name, url in tables)
+
+    for (table_name, url), result in zip(tables, results):
+        # Pages that did not parse are retried in the browser from this thread
+        if result[2] == "Parse Error" and fallback is not None:
+            log(f"  ! {table_name} did not parse, falling back to Playwright")
+            fallback_result = crawl_table(fallback, table_name, url)
+            result = fallback_result[:4] + (result[4] + fallback_result[4], fallback_result[5])
+        yield table_name, url, result
+
+# Process tables for a specific letter, writing both outputs
+def process_letter_tables(source, fallback, executor, letter, letter_tables, tables_dir, pk_dir, state_dir):
+    log(f"PROCESSING LETTER '{letter}' - {len(letter_tables)} tables")
+
+    column_writer, pk_writer, written_tables = open_letter_writers(letter, tables_dir, pk_dir)
+    letter_tables = [(name, url) for name, url in letter_tables if name not in written_tables]
+
+    total_success = 0
+    total_error = 0
+    for table_name, url, result in crawl_tables(source, fallback, executor, letter_tables):
+        column_rows, pk_rows, status, error = result[:4]
+
+        if column_rows:
+            total_success += 1
+        else:
+            total_error += 1
+            log(f"  ! {table_name}: {status} {error}")
+        append_table(column_writer, pk_writer, table_name, column_rows, pk_rows)
+        record_table(letter, table_name, url, result, tables_dir, pk_dir, state_dir)
+
+    # Move the finished letter files into place
+    finalize_letter_writers(column_writer, pk_writer)
+
+    log(f"Letter '{letter}' processing complete: {total_success} successful, {total_error} failed")
+    return total_success, total_error
+
+# Function to read the table names present in a finished letter file
+def letter_file_tables(letter_file):
+    if not os.path.exists(letter_file):
+        return set()
+    with open(letter_file, newline='', encoding='utf-8') as f:
+        return {row['table_name'] for row in csv.DictReader(f)}
+
+# Function to list the tables of finished letters that still need a retry
+def remaining_tables(tables_dir, state_dir, letter_groups, processed_letters, retry_statuses):
+    """Return {letter: [(table_name, url)]} for finished letters
+
+    A table is remaining when its last status is one of retry_statuses, or
+    when it has no recorded state (new in the index, or crawled before the
+    state database existed) and no rows in the letter file. Tables that
+    succeeded are never revisited. Unfinished letters resume from their
+    partial files instead.
+    """
+    state = crawl_state(state_dir)
+    remaining = {}
+    for letter in ALPHABET:
+        if letter not in processed_letters:
+            continue
+        tables = []
+        written_tables = None
+        for table_name, url in letter_groups.get(letter, []):
+            entry = state.get_table(table_name)
+            if entry is None:
+                # Only read the letter file when some table has no state
+                if written_tables is None:
+                    written_tables = letter_file_tables(os.path.join(tables_dir, f"{letter}.csv"))
+                if table_name not in written_tables:
+                    tables.append((table_name, url))
+            elif entry['status'] in retry_statuses:
+                tables.append((table_name, url))
+        if tables:
+            remaining[letter] = tables
+    return remaining
+
+# Function to re-crawl the remaining tables of a finished letter and merge them into its files
+def retry_letter_tables(source, fallback, executor, letter, letter_tables, retry, tables_dir, pk_dir, state_dir, pk_writer):
+    log(f"RETRYING LETTER '{letter}' - {len(retry)} of {len(letter_tables)} tables")
+
+    changed_rows = {}
+    total_success = 0
+    for table_name, url, result in crawl_tables(source, fallback, executor, retry):
+        column_rows, pk_rows, status, error = result[:4]
+        if column_rows:
+            changed_rows[table_name] = column_rows
+            total_success += 1
+        else:
+            log(f"  ! {table_name}: {status} {error}")
+        pk_writer.append(letter, pk_rows)
+        record_table(letter, table_name, url, result, tables_dir, pk_dir, state_dir)
+
+    # Recovered tables are slotted into the column file in index order
+    if changed_rows:
+        letter_file = os.path.join(tables_dir, f"{letter}.csv")
+        total = rewrite_letter_file(letter_file, epic_data_scraper_alphabetical.columns, letter_tables, changed_rows, set())
+        log(f"Merged {len(changed_rows)} recovered tables into {letter_file} ({total} rows)")
+        write_letter_partition(tables_dir, letter)
+
+    log(f"Letter '{letter}' retry complete: {total_success} recovered, {len(retry) - total_success} still failing")
+    return total_success
+
+# Function to crawl every pending letter once into both outputs, then optionally retry failed tables
+def crawl(source, fallback, executor, tables_dir, pk_dir, state_dir, retry_statuses=None, dry_run=False):
+    for directory in (tables_dir, pk_dir, state_dir):
+        os.makedirs(directory, exist_ok=True)
+    ensure_summaries(tables_dir, pk_dir)
+
+    processed_letters, _ = load_progress(state_dir)
+    letter_groups = group_tables_by_letter(source.list_tables(), ALPHABET)
+    pending = [letter for letter in ALPHABET if letter not in processed_letters and letter_groups.get(letter)]
+    remaining = remaining_tables(tables_dir, state_dir, letter_groups, processed_letters, retry_statuses) if retry_statuses else {}
+
+    log(f"Remaining work: {len(pending)} unfinished letters {pending}, "
+        f"{sum(len(tables) for tables in remaining.values())} tables to retry in {sorted(remaining)}")
+    if dry_run:
+        for letter, tables in remaining.items():
+            log(f"  {letter}: {', '.join(name for name, _ in tables)}")
+        return
+
+    start_time = datetime.now()
+    for letter in pending:
+        save_progress(state_dir, processed_letters, letter)
+        process_letter_tables(source, fallback, executor, letter, letter_groups[letter], tables_dir, pk_dir, state_dir)
+        processed_letters.add(letter)
+        save_progress(state_dir, processed_letters)
+
+    if remaining:
+        pk_writer = PrimaryKeyWriter(pk_dir)
+        try:
+            for letter, retry in remaining.items():
+                retry_letter_tables(source, fallback, executor, letter, letter_groups[letter], retry,
+                                    tables_dir, pk_dir, state_dir, pk_writer)
+        finally:
+            pk_writer.close()
+
+    log(f"Crawl complete in {(datetime.now() - start_time).total_seconds():.1f}s")
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Single-pass crawl of the Epic EHI tables into column and primary key outputs")
+    parser.add_argument('--engine', choices=['http', 'browser'], default='http')
+    parser.add_argument('--workers', type=int, default=16, help="Concurrent HTTP requests (http engine)")
+    parser.add_argument('--headed', action='store_true', help="Show the browser window (browser engine)")
+    parser.add_argument('--max-rate', type=float, default=50.0, help="Upper bound on page requests/second")
+    parser.add_argument('--tables-dir', default='epic_data_tables')
+    parser.add_argument('--pk-dir', default='epic_data_primary_keys')
+    parser.add_argument('--state-dir', default='epic_crawl_state')
+    parser.add_argument('--snapshot-dir', default='epic_html_snapshots')
+    parser.add_argument('--no-snapshot', action='store_true', help="Do not store fetched pages")
+    parser.add_argument('--full-page-load', action='store_true',
+                        help="Load every page resource and wait for network idle (browser engine and fallback)")
+    parser.add_argument('--resume', action='store_true',
+                        help="After any unfinished letters, retry tables of finished letters that failed or had no data")
+    parser.add_argument('--retry-status', action='append', metavar='STATUS',
+                        help="Status to retry with --resume (repeatable; default: Error, Parse Error, No Data)")
+    parser.add_argument('--dry-run', action='store_true', help="Only report the remaining work")
+    parser.add_argument('--normalized-dir', metavar='DIR',
+                        help="Also write the normalized letter files with deduplicated descriptions to DIR")
+    args = parser.parse_args()
+    retry_statuses = (args.retry_status or list(RETRY_STATUSES)) if args.resume else None
+
+    print("\n" + "="*70)
+    print(f"EPIC EHI TABLES SINGLE-PASS EXTRACTION - {args.engine.upper()}")
+    print("="*70 + "\n")
+
+    snapshot_store = None if args.no_snapshot else SnapshotStore(args.snapshot_dir)
+    rate_limiter = AimdRateLimiter(max_rate=args.max_rate)
+    executor = None
+    if args.engine == 'http':
+        source = HttpPageSource(args.workers, snapshot_store, rate_limiter)
+        fallback = BrowserPageSource(headless=True, snapshot_store=snapshot_store, rate_limiter=rate_limiter,
+                                     lean=not args.full_page_load)
+        executor = ThreadPoolExecutor(max_workers=args.workers)
+    else:
+        source = BrowserPageSource(headless=not args.headed, snapshot_store=snapshot_store, rate_limiter=rate_limiter,
+                                   lean=not args.full_page_load)
+        fallback = None
+
+    try:
+        crawl(source, fallback, executor, args.tables_dir, args.pk_dir, args.state_dir, retry_statuses, args.dry_run)
+        rate_limiter.log_stats()
+        if args.normalized_dir and not args.dry_run:
+            build_normalized(args.tables_dir, args.normalized_dir)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if fallback is not None:
+            fallback.close()
+        source.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import os
+import csv
+import sqlite3
+import threading
+from datetime import datetime
+
+from epic_log import log
+
+# Transactional crawl state kept in {directory}/crawl_state.db.
+#
+#   table_state  - one row per table: letter, url, last status, attempt count,
+#                  row count, processing time and error text
+#   letter_state - letters that are done, plus the letter being processed
+#
+# The database runs in WAL mode so readers never block the writer, and each
+# thread (or process) gets its own connection; concurrent writers just wait
+# on SQLite's lock for up to BUSY_TIMEOUT seconds.
+
+STATE_DB = 'crawl_state.db'
+BUSY_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS table_state (
+    table_name      TEXT PRIMARY KEY,
+    letter          TEXT NOT NULL,
+    url             TEXT,
+    status          TEXT NOT NULL,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    row_count       INTEGER NOT NULL DEFAULT 0,
+    processing_time REAL,
+    error           TEXT NOT NULL DEFAULT '',
+    updated_at      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS table_state_letter ON table_state (letter, status);
+CREATE INDEX IF NOT EXISTS table_state_status ON table_state (status);
+
+CREATE TABLE IF NOT EXISTS letter_state (
+    letter     TEXT PRIMARY KEY,
+    status     TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+UPSERT_TABLE = """
+INSERT INTO table_state (table_name, letter, url, status, attempts, row_count, processing_time, error, updated_at)
+VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+ON CONFLICT (table_name) DO UPDATE SET
+    letter = excluded.letter,
+    url = COALESCE(excluded.url, table_state.url),
+    status = excluded.status,
+    attempts = table_state.attempts + 1,
+    row_count = excluded.row_count,
+    processing_time = excluded.processing_time,
+    error = excluded.error,
+    updated_at = excluded.updated_at
+"""
+
+class CrawlState:
+    def __init__(self, directory, legacy_progress_file=None, legacy_summary_file=None):
+        self.path = os.path.join(directory, STATE_DB)
+        self.local = threading.local()
+        os.makedirs(directory, exist_ok=True)
+
+        new_db = not os.path.exists(self.path)
+        conn = self._connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        with conn:
+            conn.executescript(SCHEMA)
+
+        # First open: carry over the CSV progress and summary files
+        if new_db:
+            if legacy_progress_file:
+                self.import_progress_csv(os.path.join(directory, legacy_progress_file))
+            if legacy_summary_file:
+                self.import_summary_csv(os.path.join(directory, legacy_summary_file))
+
+    def _connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def record_table(self, letter, table_name, status, row_count=0, error='', processing_time=None, url=None):
+        """Record one attempt at a table"""
+        conn = self._connect()
+        with conn:
+            conn.execute(UPSERT_TABLE, (table_name, letter, url, status, row_count, processing_time,
+                                        error or '', datetime.now().isoformat(timespec='seconds')))
+
+    def get_table(self, table_name):
+        row = self._connect().execute('SELECT * FROM table_state WHERE table_name = ?', (table_name,)).fetchone()
+        return dict(row) if row else None
+
+    def __contains__(self, table_name):
+        """True when the table has been attempted at least once"""
+        row = self._connect().execute('SELECT 1 FROM table_state WHERE table_name = ?', (table_name,)).fetchone()
+        return row is not None
+
+    def tables_with_status(self, statuses, letter=None):
+        """Return the names of tables whose last status is one of statuses, optionally for one letter"""
+        placeholders = ', '.join('?' * len(statuses))
+        query = f'SELECT table_name FROM table_state WHERE status IN ({placeholders})'
+        params = list(statuses)
+        if letter is not None:
+            query += ' AND letter = ?'
+            params.append(letter)
+        return [row[0] for row in self._connect().execute(query + ' ORDER BY table_name', params)]
+
+    def status_counts(self):
+        rows = self._connect().execute('SELECT status, COUNT(*) FROM table_state GROUP BY status')
+        return {status: count for status, count in rows}
+
+    def load_progress(self):
+        """Return (processed letters, current letter)"""
+        rows = self._connect().execute('SELECT letter, status FROM letter_state').fetchall()
+        processed_letters = {letter for letter, status in rows if status == 'done'}
+        current = [letter for letter, status in rows if status == 'current']
+        return processed_letters, (current[0] if current else None)
+
+    def save_progress(self, processed_letters, current_letter=None):
+        """Replace the letter progress in one transaction"""
+        now = datetime.now().isoformat(timespec='seconds')
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM letter_state')
+            conn.executemany('INSERT INTO letter_state VALUES (?, ?, ?)',
+                             [(letter, 'done', now) for letter in processed_letters])
+            if current_letter and current_letter not in processed_letters:
+                conn.execute('INSERT INTO letter_state VALUES (?, ?, ?)', (current_letter, 'current', now))
+
+    def import_progress_csv(self, progress_file):
+        if not os.path.exists(progress_file):
+            return
+        with open(progress_file, newline='') as f:
+            rows = list(csv.DictReader(f))
+        processed_letters = {row['letter'] for row in rows if row.get('letter')}
+        current = [row['current_letter'] for row in rows if row.get('current_letter')]
+        self.save_progress(processed_letters, current[0] if current else None)
+        log(f"Imported letter progress from {progress_file}")
+
+    def import_summary_csv(self, summary_file):
+        """Replay a processing summary file; each row counts as one attempt"""
+        if not os.path.exists(summary_file):
+            return
+        records = []
+        now = datetime.now().isoformat(timespec='seconds')
+        with open(summary_file, newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)  # Skip header
+            for row in reader:
+                # Rows written before the Letter column was added have five fields
+                if len(row) == 5:
+                    row = [''] + row
+                if len(row) < 6 or not row[1]:
+                    continue
+                letter, table_name, count, status, error, processing_time = row[:6]
+                if not letter:
+                    letter = table_name[0].upper() if table_name[0].isalpha() else 'SPECIAL'
+                try:
+                    count, processing_time = int(float(count or 0)), float(processing_time or 0)
+                except ValueError:
+                    log(f"Skipping malformed summary row: {row}")
+                    continue
+                records.append((table_name, letter, None, status or 'Error', count, processing_time, error, now))
+        conn = self._connect()
+        with conn:
+            conn.executemany(UPSERT_TABLE, records)
+        log(f"Imported {len(records)} table results from {summary_file}")
+
+_states = {}
+_states_lock = threading.Lock()
+
+# Function to get the shared CrawlState for a directory
+def get_crawl_state(directory, legacy_progress_file=None, legacy_summary_file=None):
+    key = os.path.abspath(directory)
+    with _states_lock:
+        if key not in _states:
+            _states[key] = CrawlState(directory, legacy_progress_file, legacy_summary_file)
+        return _states[key]
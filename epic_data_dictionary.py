@@ -0,0 +1,167 @@
+import os
+import re
+import csv
+import sys
+import time
+import threading
+from collections import OrderedDict, defaultdict
+
+from epic_pk_writer import LETTER_FILE as PK_LETTER_FILE
+
+# Importable, read-only API over the letter-partitioned output.
+#
+#   dictionary = DataDictionary()
+#   dictionary.table('ABN_DOCUMENT_ID')              # column rows in ordinal order
+#   dictionary.primary_key('ABN_DOCUMENT_ID')        # ['PAT_ENC_CSN_ID', ...]
+#   dictionary.tables_with_column('PAT_ENC_CSN_ID')
+#
+# A letter shard ({letter}.csv joined with pk_{letter}.csv) is only read when
+# a table in it is first requested, and is then held in hash indexes by table
+# and by column name. At most max_shards letters stay loaded; the least
+# recently used one is dropped when another is needed. A shard whose files
+# changed on disk is read again on its next use; files are checked at most
+# once every check_interval seconds so cached lookups stay at dict speed.
+#
+# The column name index of every letter read so far is kept after its shard
+# is evicted - it holds only names - so tables_with_column() reads each
+# letter once rather than cycling all of them through the LRU.
+
+csv.field_size_limit(sys.maxsize)
+
+# Staleness checks of the derived files use these, so they load no PyArrow
+LETTER_FILE = re.compile(r'^([A-Z]|SPECIAL)\.csv$')
+
+# Function to list the (letter, path) source files of one directory, in letter order
+def source_files(directory, pattern):
+    matches = (pattern.match(name) for name in sorted(os.listdir(directory)))
+    return [(match.group(1), os.path.join(directory, match.group(0))) for match in matches if match]
+
+# Function to fingerprint the source files as {dir/file: [size, mtime_ns]}
+def source_signatures(tables_dir, pk_dir):
+    signatures = {}
+    for directory, pattern in ((tables_dir, LETTER_FILE), (pk_dir, PK_LETTER_FILE)):
+        for _, path in source_files(directory, pattern):
+            stat = os.stat(path)
+            name = os.path.join(os.path.basename(os.path.normpath(directory)), os.path.basename(path))
+            signatures[name] = [stat.st_size, stat.st_mtime_ns]
+    return signatures
+
+# Function to get the letter shard holding a table
+def letter_for(table_name):
+    first_letter = table_name[:1].upper()
+    return first_letter if first_letter.isalpha() else 'SPECIAL'
+
+class LetterShard:
+    def __init__(self, letter, column_file, pk_file):
+        self.letter = letter
+        self.signature = self.file_signature(column_file, pk_file)
+        self.checked_at = time.monotonic()
+        self.tables = defaultdict(list)
+        self.column_index = defaultdict(list)
+        self.primary_keys = defaultdict(dict)
+
+        if os.path.exists(pk_file):
+            with open(pk_file, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    position = int(row['ordinal_position']) if row['ordinal_position'].isdigit() else None
+                    self.primary_keys[row['table_name']][row['column_name']] = position
+
+        if os.path.exists(column_file):
+            with open(column_file, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    table_name = row['table_name']
+                    # Primary key data is joined onto the column rows
+                    row['pk_ordinal_position'] = self.primary_keys.get(table_name, {}).get(row['column_name'])
+                    self.tables[table_name].append(row)
+                    self.column_index[row['column_name']].append(table_name)
+
+        self.tables = dict(self.tables)
+        self.column_index = dict(self.column_index)
+        self.primary_keys = dict(self.primary_keys)
+
+    @staticmethod
+    def file_signature(*paths):
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+class DataDictionary:
+    def __init__(self, tables_dir='epic_data_tables', pk_dir='epic_data_primary_keys', max_shards=4, check_interval=1.0):
+        self.tables_dir = tables_dir
+        self.pk_dir = pk_dir
+        self.max_shards = max_shards
+        self.check_interval = check_interval
+        self.shards = OrderedDict()
+        self.column_indexes = {}
+        self.lock = threading.Lock()
+        self.loads = 0
+
+    def _files(self, letter):
+        return os.path.join(self.tables_dir, f"{letter}.csv"), os.path.join(self.pk_dir, f"pk_{letter}.csv")
+
+    def shard(self, letter):
+        """Return the loaded shard for a letter, reading it if it is not cached or its files changed"""
+        files = self._files(letter)
+        with self.lock:
+            shard = self.shards.get(letter)
+            if shard is not None and time.monotonic() - shard.checked_at >= self.check_interval:
+                if shard.signature == LetterShard.file_signature(*files):
+                    shard.checked_at = time.monotonic()
+                else:
+                    shard = None
+            if shard is not None:
+                self.shards.move_to_end(letter)
+                return shard
+
+            shard = LetterShard(letter, *files)
+            self.loads += 1
+            self.column_indexes[letter] = (shard.signature, shard.column_index)
+            self.shards[letter] = shard
+            self.shards.move_to_end(letter)
+            while len(self.shards) > self.max_shards:
+                self.shards.popitem(last=False)
+            return shard
+
+    def letters(self):
+        """Letters that have a column file"""
+        names = (os.path.splitext(name)[0] for name in os.listdir(self.tables_dir) if name.endswith('.csv'))
+        return sorted(name for name in names if (len(name) == 1 and name.isalpha()) or name == 'SPECIAL')
+
+    def __contains__(self, table_name):
+        return table_name in self.shard(letter_for(table_name)).tables
+
+    def table(self, table_name):
+        """Return the column rows of a table in file order; raises KeyError for an unknown table"""
+        return self.shard(letter_for(table_name)).tables[table_name]
+
+    def column(self, table_name, column_name):
+        for row in self.table(table_name):
+            if row['column_name'] == column_name:
+                return row
+        raise KeyError(f"{table_name}.{column_name}")
+
+    def primary_key(self, table_name):
+        """Return a table's primary key column names in key order"""
+        columns = self.shard(letter_for(table_name)).primary_keys.get(table_name, {})
+        return sorted(columns, key=lambda column: (columns[column] is None, columns[column] or 0))
+
+    def tables(self, letter):
+        return sorted(self.shard(letter).tables)
+
+    def tables_with_column(self, column_name, letters=None):
+        """Return the tables that have a column; letters not indexed yet are read once"""
+        found = []
+        for letter in letters or self.letters():
+            signature, column_index = self.column_indexes.get(letter, (None, None))
+            if signature is None or signature != LetterShard.file_signature(*self._files(letter)):
+                column_index = self.shard(letter).column_index
+            found.extend(column_index.get(column_name, []))
+        return sorted(found)
+
+    def cache_info(self):
+        return {'loaded': list(self.shards), 'max_shards': self.max_shards, 'loads': self.loads}
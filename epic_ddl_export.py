@@ -0,0 +1,263 @@
+import os
+import csv
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from epic_log import log
+from epic_data_dictionary import LETTER_FILE, source_files
+from epic_table_parser import collapse_repeated_description
+
+# CREATE TABLE statements for a staging schema, straight from the letter files.
+#
+#   {output_dir}/{dialect}/{letter}.sql
+#
+# Each letter is one job in a process pool. A job reads pk_{letter}.csv (a
+# few hundred KB at most) into a dict, then streams {letter}.csv row by row.
+# Rows of a table are contiguous, so only the current table's columns are
+# held; its statement is written as soon as the next table starts. Memory
+# stays flat however large the letter file is.
+#
+# Column comments come from the descriptions, collapsed to one copy. A table
+# whose primary key names a column missing from its column list, or whose key
+# the dialect cannot index, gets no PRIMARY KEY clause, only a SQL comment
+# saying so.
+
+csv.field_size_limit(sys.maxsize)
+
+DDL_DIR = 'epic_ddl'
+
+class Dialect:
+    name = None
+    types = {}
+    # Overrides of types for primary key columns
+    key_types = {}
+    text_type = 'TEXT'
+    comment_limit = None
+
+    def quote(self, identifier):
+        return '"' + identifier.replace('"', '""') + '"'
+
+    def literal(self, text):
+        return "'" + text.replace("'", "''") + "'"
+
+    def table_name(self, schema, table_name):
+        return f"{self.quote(schema)}.{self.quote(table_name)}" if schema else self.quote(table_name)
+
+    def column_type(self, epic_type, is_key=False):
+        # DATETIME (Local), DATETIME (UTC) and DATETIME (Attached) all map to DATETIME
+        base_type = epic_type.split(' (')[0].strip().upper()
+        if is_key and base_type in self.key_types:
+            return self.key_types[base_type]
+        return self.types.get(base_type, self.text_type)
+
+    def comment_text(self, description):
+        text = ' '.join(description.split())
+        if self.comment_limit and len(text) > self.comment_limit:
+            text = text[:self.comment_limit - 3] + '...'
+        return text
+
+    def column_definition(self, column, is_key=False):
+        return f"{self.quote(column['column_name'])} {self.column_type(column['type'], is_key)}"
+
+    def key_problem(self, columns, primary_key):
+        """Return why the dialect cannot index the primary key, or None when it can"""
+        return None
+
+    def create_table(self, schema, table_name, columns, primary_key):
+        """Return the statements for one table; columns are dicts with a collapsed description"""
+        lines = [self.column_definition(column, column['column_name'] in primary_key) for column in columns]
+        if primary_key:
+            lines.append(f"PRIMARY KEY ({', '.join(self.quote(name) for name in primary_key)})")
+        statement = f"CREATE TABLE {self.table_name(schema, table_name)} (\n    " + ',\n    '.join(lines) + "\n);\n"
+        return statement + ''.join(self.column_comment(schema, table_name, column)
+                                   for column in columns if column['description'])
+
+    def column_comment(self, schema, table_name, column):
+        return ''
+
+class PostgresDialect(Dialect):
+    name = 'postgres'
+    types = {'VARCHAR': 'VARCHAR', 'NUMERIC': 'NUMERIC', 'INTEGER': 'INTEGER', 'FLOAT': 'DOUBLE PRECISION',
+             'DATETIME': 'TIMESTAMP'}
+
+    def column_comment(self, schema, table_name, column):
+        return (f"COMMENT ON COLUMN {self.table_name(schema, table_name)}.{self.quote(column['column_name'])} "
+                f"IS {self.literal(self.comment_text(column['description']))};\n")
+
+class MySqlDialect(Dialect):
+    name = 'mysql'
+    # Wide tables with every VARCHAR as VARCHAR(n) pass the 65,535-byte row limit, so only key
+    # columns get a length. A TEXT column cannot be a key part without a prefix length.
+    types = {'VARCHAR': 'TEXT', 'NUMERIC': 'DECIMAL(38,10)', 'INTEGER': 'INT', 'FLOAT': 'DOUBLE',
+             'DATETIME': 'DATETIME'}
+    key_types = {'VARCHAR': 'VARCHAR(191)'}
+    # Bytes each key type takes in an InnoDB index; utf8mb4 counts 4 bytes per character
+    key_bytes = {'VARCHAR(191)': 764, 'DECIMAL(38,10)': 18, 'INT': 4, 'DOUBLE': 8, 'DATETIME': 5}
+    # InnoDB rejects wider keys with error 1071 and keys of more parts with error 1070
+    max_key_bytes = 3072
+    max_key_parts = 16
+    comment_limit = 1024
+
+    def quote(self, identifier):
+        return '`' + identifier.replace('`', '``') + '`'
+
+    def literal(self, text):
+        return "'" + text.replace('\\', '\\\\').replace("'", "''") + "'"
+
+    def column_definition(self, column, is_key=False):
+        definition = super().column_definition(column, is_key)
+        if column['description']:
+            definition += f" COMMENT {self.literal(self.comment_text(column['description']))}"
+        return definition
+
+    def key_problem(self, columns, primary_key):
+        if len(primary_key) > self.max_key_parts:
+            return f"has {len(primary_key)} columns, more than MySQL's {self.max_key_parts}"
+        types = {column['column_name']: self.column_type(column['type'], True) for column in columns}
+        if any(types[name] not in self.key_bytes for name in primary_key):
+            return "has a column MySQL cannot index without a prefix length"
+        width = sum(self.key_bytes[types[name]] for name in primary_key)
+        if width > self.max_key_bytes:
+            return f"is {width:,} bytes wide, more than InnoDB's {self.max_key_bytes:,}"
+        return None
+
+class SqlServerDialect(Dialect):
+    name = 'sqlserver'
+    types = {'VARCHAR': 'VARCHAR(254)', 'NUMERIC': 'NUMERIC(38,10)', 'INTEGER': 'INT', 'FLOAT': 'FLOAT',
+             'DATETIME': 'DATETIME2'}
+    text_type = 'NVARCHAR(MAX)'
+    # Extended property values are sql_variant, at most 7,500 bytes
+    comment_limit = 3750
+
+    def quote(self, identifier):
+        return '[' + identifier.replace(']', ']]') + ']'
+
+    def literal(self, text):
+        return "N'" + text.replace("'", "''") + "'"
+
+    def column_comment(self, schema, table_name, column):
+        return (f"EXEC sys.sp_addextendedproperty @name = N'MS_Description', "
+                f"@value = {self.literal(self.comment_text(column['description']))}, "
+                f"@level0type = N'SCHEMA', @level0name = {self.literal(schema or 'dbo')}, "
+                f"@level1type = N'TABLE', @level1name = {self.literal(table_name)}, "
+                f"@level2type = N'COLUMN', @level2name = {self.literal(column['column_name'])};\n")
+
+class SqliteDialect(Dialect):
+    name = 'sqlite'
+    types = {'VARCHAR': 'TEXT', 'NUMERIC': 'NUMERIC', 'INTEGER': 'INTEGER', 'FLOAT': 'REAL', 'DATETIME': 'TEXT'}
+
+    def create_table(self, schema, table_name, columns, primary_key):
+        # SQLite has no column comments, but keeps comments inside CREATE TABLE in sqlite_master
+        lines = []
+        for position, column in enumerate(columns):
+            separator = ',' if position < len(columns) - 1 or primary_key else ''
+            comment = f"  -- {self.comment_text(column['description'])}" if column['description'] else ''
+            lines.append(f"    {self.column_definition(column, column['column_name'] in primary_key)}{separator}{comment}")
+        if primary_key:
+            lines.append(f"    PRIMARY KEY ({', '.join(self.quote(name) for name in primary_key)})")
+        return f"CREATE TABLE {self.table_name(schema, table_name)} (\n" + '\n'.join(lines) + "\n);\n"
+
+DIALECTS = {dialect.name: dialect for dialect in (PostgresDialect, MySqlDialect, SqlServerDialect, SqliteDialect)}
+
+# Function to read a letter's primary keys as {table: [column, ...]} in key order
+def read_primary_keys(pk_file):
+    keys = {}
+    if not os.path.exists(pk_file):
+        return keys
+    with open(pk_file, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            position = int(row['ordinal_position']) if row['ordinal_position'].isdigit() else 0
+            keys.setdefault(row['table_name'], []).append((position, row['column_name']))
+    return {table_name: [column for _, column in sorted(columns)] for table_name, columns in keys.items()}
+
+# Function to group the rows of a letter file by table without holding more than one table
+def iter_tables(column_file):
+    with open(column_file, newline='', encoding='utf-8') as f:
+        table_name, columns = None, []
+        for row in csv.DictReader(f):
+            if row['table_name'] != table_name:
+                if columns:
+                    yield table_name, columns
+                table_name, columns = row['table_name'], []
+            columns.append(row)
+        if columns:
+            yield table_name, columns
+
+# Function to write the DDL of one letter (runs in a worker process)
+def write_letter_ddl(letter, column_file, pk_file, output_file, dialect_name, schema=None, skip_discontinued=False):
+    dialect = DIALECTS[dialect_name]()
+    primary_keys = read_primary_keys(pk_file)
+    table_count = column_count = 0
+    incomplete_keys = []
+
+    tmp_path = output_file + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        for table_name, rows in iter_tables(column_file):
+            columns = [{'column_name': row['column_name'], 'type': row['type'],
+                        'description': collapse_repeated_description(row['description'])}
+                       for row in rows if not (skip_discontinued and row['discontinued'] == 'Yes')]
+            if not columns:
+                continue
+            primary_key = primary_keys.get(table_name, [])
+            names = {column['column_name'] for column in columns}
+            missing = [name for name in primary_key if name not in names]
+            if missing:
+                out.write(f"-- Primary key column(s) {', '.join(missing)} of {table_name} are not in its column list\n")
+                incomplete_keys.append((table_name, "primary key names columns the table does not have"))
+                primary_key = []
+            problem = dialect.key_problem(columns, primary_key) if primary_key else None
+            if problem:
+                out.write(f"-- Primary key ({', '.join(primary_key)}) of {table_name} {problem}\n")
+                incomplete_keys.append((table_name, f"primary key {problem}"))
+                primary_key = []
+            out.write(dialect.create_table(schema, table_name, columns, primary_key) + '\n')
+            table_count += 1
+            column_count += len(columns)
+    os.replace(tmp_path, output_file)
+    return letter, table_count, column_count, incomplete_keys
+
+# Function to write the DDL of every letter in parallel
+def export_ddl(tables_dir='epic_data_tables', pk_dir='epic_data_primary_keys', output_dir=DDL_DIR, dialect='postgres',
+               schema=None, skip_discontinued=False, workers=None):
+    if dialect not in DIALECTS:
+        raise ValueError(f"Unknown dialect {dialect}; choose from {', '.join(sorted(DIALECTS))}")
+    dialect_dir = os.path.join(output_dir, dialect)
+    os.makedirs(dialect_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    # Biggest letters first, so no large letter starts last
+    letters = sorted(source_files(tables_dir, LETTER_FILE), key=lambda item: -os.path.getsize(item[1]))
+    totals = [0, 0]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        jobs = [executor.submit(write_letter_ddl, letter, column_file, os.path.join(pk_dir, f"pk_{letter}.csv"),
+                                os.path.join(dialect_dir, f"{letter}.sql"), dialect, schema, skip_discontinued)
+                for letter, column_file in letters]
+        for job in jobs:
+            letter, table_count, column_count, incomplete_keys = job.result()
+            totals[0] += table_count
+            totals[1] += column_count
+            for table_name, reason in incomplete_keys:
+                log(f"{table_name}: {reason}, PRIMARY KEY left out")
+
+    log(f"Wrote {dialect} DDL for {totals[0]} tables, {totals[1]} columns in {len(letters)} letter files "
+        f"to {dialect_dir} in {time.perf_counter() - start:.1f}s")
+    return totals
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Generate CREATE TABLE statements from the letter files")
+    parser.add_argument('--dialect', choices=sorted(DIALECTS), default='postgres')
+    parser.add_argument('--schema', help="Schema to qualify table names with")
+    parser.add_argument('--tables-dir', default='epic_data_tables')
+    parser.add_argument('--pk-dir', default='epic_data_primary_keys')
+    parser.add_argument('--output-dir', default=DDL_DIR)
+    parser.add_argument('--skip-discontinued', action='store_true', help="Leave out discontinued columns")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    export_ddl(args.tables_dir, args.pk_dir, args.output_dir, args.dialect, args.schema, args.skip_discontinued, args.workers)
+
+if __name__ == "__main__":
+    main()
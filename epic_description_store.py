@@ -0,0 +1,128 @@
+import os
+import re
+import csv
+import sys
+import time
+import hashlib
+import argparse
+
+from epic_log import log
+from epic_table_parser import collapse_repeated_description
+
+# Normalized copy of the letter files with every description stored once.
+#
+#   {output_dir}/descriptions.csv  - description_id,description
+#   {output_dir}/{letter}.csv      - the letter's columns, with description_id
+#                                    in place of description
+#
+# description_id is the first 16 hex digits of the SHA-256 of the collapsed
+# text, so the same description gets the same ID in every table, letter and
+# rebuild. Descriptions that were stored twice by the continuation-row merge
+# are collapsed to one copy first (see collapse_repeated_description).
+
+csv.field_size_limit(sys.maxsize)
+
+DESCRIPTIONS_FILE = 'descriptions.csv'
+LETTER_FILE = re.compile(r'^([A-Z]|SPECIAL)\.csv$')
+NORMALIZED_COLUMNS = ['table_name', 'column_name', 'primary_key', 'ordinal_position', 'type', 'discontinued', 'description_id']
+
+# Function to compute the content hash ID of a description
+def description_id(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+# Function to write rows to a file atomically
+def _write_csv(path, columns, rows):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+# Function to normalize every letter file into output_dir
+def build_normalized(tables_dir='epic_data_tables', output_dir='epic_data_normalized'):
+    """Rewrite the normalized letter files and the description table; returns (rows, unique descriptions)"""
+    os.makedirs(output_dir, exist_ok=True)
+    descriptions = {}
+    letters = sorted(match.group(1) for match in map(LETTER_FILE.match, os.listdir(tables_dir)) if match)
+    total_rows = 0
+
+    for letter in letters:
+        rows = []
+        with open(os.path.join(tables_dir, f"{letter}.csv"), newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                text = collapse_repeated_description(row['description'])
+                row['description_id'] = description_id(text)
+                descriptions.setdefault(row['description_id'], text)
+                rows.append(row)
+        _write_csv(os.path.join(output_dir, f"{letter}.csv"), NORMALIZED_COLUMNS, rows)
+        total_rows += len(rows)
+
+    # Letters that no longer have a source file are dropped
+    for name in os.listdir(output_dir):
+        match = LETTER_FILE.match(name)
+        if match and match.group(1) not in letters:
+            os.remove(os.path.join(output_dir, name))
+
+    _write_csv(os.path.join(output_dir, DESCRIPTIONS_FILE), ['description_id', 'description'],
+               ({'description_id': key, 'description': text} for key, text in descriptions.items()))
+    log(f"Normalized {total_rows} rows from {len(letters)} letters into {output_dir}: {len(descriptions)} unique descriptions")
+    return total_rows, len(descriptions)
+
+# Function to read the description table as {description_id: description}
+def load_descriptions(output_dir='epic_data_normalized'):
+    with open(os.path.join(output_dir, DESCRIPTIONS_FILE), newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Skip header
+        return dict(reader)
+
+# Function to load normalized column rows, with descriptions resolved
+def load_normalized(output_dir='epic_data_normalized', letters=None, resolve=True):
+    """Return the column rows of the given letters (all by default)
+
+    With resolve, rows have the letter file layout and rows with the same
+    description share one string object. Without it, rows keep their
+    description_id and the description table is not read at all.
+    """
+    descriptions = load_descriptions(output_dir) if resolve else None
+    if letters is None:
+        letters = sorted(match.group(1) for match in map(LETTER_FILE.match, os.listdir(output_dir)) if match)
+    columns = NORMALIZED_COLUMNS[:-1] + (['description'] if resolve else ['description_id'])
+    rows = []
+    for letter in letters:
+        with open(os.path.join(output_dir, f"{letter}.csv"), newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader, None)  # Skip header
+            for values in reader:
+                if resolve:
+                    values[-1] = descriptions[values[-1]]
+                rows.append(dict(zip(columns, values)))
+    return rows
+
+# Function to total the size of the letter files in a directory
+def _letter_bytes(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory) if LETTER_FILE.match(name))
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Build the normalized letter files with a deduplicated description table")
+    parser.add_argument('--tables-dir', default='epic_data_tables')
+    parser.add_argument('--output-dir', default='epic_data_normalized')
+    parser.add_argument('--load', action='store_true', help="Time a full load of the normalized files afterwards")
+    args = parser.parse_args()
+
+    build_normalized(args.tables_dir, args.output_dir)
+    source_bytes = _letter_bytes(args.tables_dir)
+    output_bytes = _letter_bytes(args.output_dir) + os.path.getsize(os.path.join(args.output_dir, DESCRIPTIONS_FILE))
+    log(f"Size: {source_bytes / 1e6:.1f} MB of letter files -> {output_bytes / 1e6:.1f} MB normalized")
+
+    if args.load:
+        start = time.perf_counter()
+        rows = load_normalized(args.output_dir)
+        resolved = time.perf_counter()
+        load_normalized(args.output_dir, resolve=False)
+        log(f"Loaded {len(rows)} rows in {(resolved - start) * 1000:.1f} ms "
+            f"({(time.perf_counter() - resolved) * 1000:.1f} ms without descriptions)")
+
+if __name__ == "__main__":
+    main()
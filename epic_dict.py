@@ -0,0 +1,216 @@
+import os
+import sys
+import time
+import argparse
+
+from epic_log import log
+
+# One command for the crawl and dictionary tools:
+#
+#   python epic_dict.py crawl [crawl engine options]
+#   python epic_dict.py resume [crawl engine options]
+#   python epic_dict.py status
+#   python epic_dict.py lookup table|pk|column|search|fuzzy NAME
+#   python epic_dict.py export parquet|arrow|normalized|db|column-index|join-graph|name-index|ddl
+#
+# Only the modules a subcommand needs are imported, inside its branch, so
+# status and lookup never load pandas, Playwright, lxml or PyArrow, and only
+# fuzzy lookups load NumPy. Other lookups read the dictionary database when
+# it exists and fall back to the letter files through DataDictionary.
+
+# (label, directory, legacy progress file, legacy summary file) of every crawl checkpoint
+STATE_DIRS = [
+    ('single-pass', 'epic_crawl_state', 'progress_state.csv', 'processing_summary.csv'),
+    ('columns', 'epic_data_tables', 'progress_state.csv', 'processing_summary.csv'),
+    ('primary keys', 'epic_data_primary_keys', 'pk_progress_state.csv', 'pk_processing_summary.csv'),
+]
+
+EXPORT_FORMATS = ['parquet', 'arrow', 'normalized', 'db', 'column-index', 'join-graph', 'name-index', 'ddl']
+
+# Function to hand the remaining arguments to the single-pass crawl engine
+def run_crawl(engine_args, resume=False):
+    import epic_crawl_engine
+    if resume and '--resume' not in engine_args:
+        engine_args = ['--resume'] + engine_args
+    sys.argv = ['epic_crawl_engine.py'] + engine_args
+    epic_crawl_engine.main()
+
+# Function to read letter progress and status counts from a crawl state database without writing to it
+def read_state_db(path):
+    import sqlite3
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute('SELECT letter, status FROM letter_state').fetchall()
+        counts = dict(conn.execute('SELECT status, COUNT(*) FROM table_state GROUP BY status'))
+    finally:
+        conn.close()
+    processed_letters = {letter for letter, status in rows if status == 'done'}
+    current = [letter for letter, status in rows if status == 'current']
+    return processed_letters, (current[0] if current else None), counts
+
+# Function to read the legacy progress and summary CSVs the way CrawlState would import them
+def read_legacy_csvs(progress_file, summary_file):
+    import csv
+    processed_letters, current_letter, statuses = set(), None, {}
+    if os.path.exists(progress_file):
+        with open(progress_file, newline='') as f:
+            for row in csv.DictReader(f):
+                if row.get('letter'):
+                    processed_letters.add(row['letter'])
+                current_letter = current_letter or row.get('current_letter') or None
+    if os.path.exists(summary_file):
+        with open(summary_file, newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)  # Skip header
+            for row in reader:
+                # Rows written before the Letter column was added have five fields
+                if len(row) == 5:
+                    row = [''] + row
+                if len(row) >= 6 and row[1]:
+                    # A table's last row is its current status
+                    statuses[row[1]] = row[3] or 'Error'
+    counts = {}
+    for status in statuses.values():
+        counts[status] = counts.get(status, 0) + 1
+    return processed_letters, current_letter, counts
+
+# Function to print crawl progress and the size of the letter files
+def show_status(tables_dir, pk_dir):
+    from epic_crawl_state import STATE_DB
+
+    # Read-only: state databases are opened with mode=ro and legacy CSVs are not migrated
+    found = False
+    for label, directory, progress_file, summary_file in STATE_DIRS:
+        state_db = os.path.join(directory, STATE_DB)
+        progress_file, summary_file = os.path.join(directory, progress_file), os.path.join(directory, summary_file)
+        if os.path.exists(state_db):
+            processed_letters, current_letter, counts = read_state_db(state_db)
+            source = STATE_DB
+        elif os.path.exists(progress_file) or os.path.exists(summary_file):
+            processed_letters, current_letter, counts = read_legacy_csvs(progress_file, summary_file)
+            source = "legacy CSVs, not yet imported"
+        else:
+            continue
+        found = True
+        print(f"{label} ({directory}, {source}): {len(processed_letters)} letters done"
+              + (f", working on {current_letter}" if current_letter else ""))
+        if processed_letters:
+            print(f"  letters: {' '.join(sorted(processed_letters))}")
+        for status, count in sorted(counts.items(), key=lambda item: -item[1]):
+            print(f"  {status:20} {count:>7}")
+    if not found:
+        print("No crawl state found")
+
+    for label, directory, prefix in (('column files', tables_dir, ''), ('primary key files', pk_dir, 'pk_')):
+        if not os.path.isdir(directory):
+            continue
+        names = [name for name in os.listdir(directory)
+                 if name.startswith(prefix) and name.endswith('.csv') and len(name) == len(prefix) + 5]
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in names)
+        print(f"{label}: {len(names)} letters, {size / 1e6:.1f} MB in {directory}")
+
+# Function to answer a lookup from the dictionary database, or from the letter files without one
+def lookup(kind, name, db_path, tables_dir, pk_dir, limit):
+    if kind == 'fuzzy':
+        from epic_name_index import open_name_index
+        return [f"{score:5.2f}  {match_kind:6}  {match}"
+                for match, match_kind, score in open_name_index(tables_dir=tables_dir, pk_dir=pk_dir).search(name, limit)]
+
+    if os.path.exists(db_path):
+        import sqlite3
+        import epic_dictionary_db as db
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            if kind == 'table':
+                return [f"{row['ordinal_position']:>4}  {row['column_name']}  {row['type']}"
+                        for row in db.table_columns(conn, name)]
+            if kind == 'pk':
+                return db.primary_key(conn, name)
+            if kind == 'column':
+                return db.tables_with_column(conn, name)
+            return [f"{score:7.2f}  {table}.{column}: {' '.join(snippet.split())}"
+                    for table, column, snippet, score in db.search(conn, name, limit)]
+        finally:
+            conn.close()
+
+    if kind == 'search':
+        raise SystemExit("Search needs the dictionary database; run: python epic_dict.py export db")
+    from epic_data_dictionary import DataDictionary
+    dictionary = DataDictionary(tables_dir, pk_dir)
+    if kind == 'table':
+        if name not in dictionary:
+            return []
+        return [f"{row['ordinal_position']:>4}  {row['column_name']}  {row['type']}" for row in dictionary.table(name)]
+    if kind == 'pk':
+        return dictionary.primary_key(name)
+    return dictionary.tables_with_column(name)
+
+# Function to build one of the derived dictionary formats
+def export(export_format, tables_dir, pk_dir, force, dialect):
+    if export_format == 'parquet':
+        from epic_parquet_export import export_dataset
+        export_dataset(tables_dir, force)
+    elif export_format == 'arrow':
+        from epic_arrow_dictionary import build_dictionary_file
+        build_dictionary_file(tables_dir, pk_dir)
+    elif export_format == 'normalized':
+        from epic_description_store import build_normalized
+        build_normalized(tables_dir)
+    elif export_format == 'db':
+        from epic_dictionary_db import build_database
+        build_database(tables_dir, pk_dir, force=force)
+    elif export_format == 'column-index':
+        from epic_column_index import build_column_index
+        build_column_index(tables_dir, pk_dir)
+    elif export_format == 'join-graph':
+        from epic_join_graph import build_join_graph
+        build_join_graph(tables_dir, pk_dir)
+    elif export_format == 'name-index':
+        from epic_name_index import build_name_index
+        build_name_index(tables_dir, pk_dir)
+    elif export_format == 'ddl':
+        from epic_ddl_export import export_ddl
+        export_ddl(tables_dir, pk_dir, dialect=dialect)
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Crawl, inspect and query the Epic EHI tables data dictionary")
+    parser.add_argument('--tables-dir', default='epic_data_tables')
+    parser.add_argument('--pk-dir', default='epic_data_primary_keys')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command, help_text in (('crawl', "Single-pass crawl; other options go to epic_crawl_engine.py"),
+                               ('resume', "Resume the single-pass crawl and retry failed tables")):
+        subparsers.add_parser(command, help=help_text, add_help=False)
+    subparsers.add_parser('status', help="Crawl progress and letter file sizes")
+    lookup_parser = subparsers.add_parser('lookup', help="Look up a table, primary key or column, search, or match a mistyped name")
+    lookup_parser.add_argument('kind', choices=['table', 'pk', 'column', 'search', 'fuzzy'])
+    lookup_parser.add_argument('name')
+    lookup_parser.add_argument('--db', default='epic_dictionary.db')
+    lookup_parser.add_argument('--limit', type=int, default=20, help="Maximum search or fuzzy results")
+    export_parser = subparsers.add_parser('export', help="Build a derived format from the letter files")
+    export_parser.add_argument('format', choices=EXPORT_FORMATS)
+    export_parser.add_argument('--force', action='store_true', help="Rebuild even when the output looks current")
+    export_parser.add_argument('--dialect', choices=['postgres', 'mysql', 'sqlserver', 'sqlite'], default='postgres',
+                               help="SQL dialect of the ddl export")
+    # Options the crawl subcommands do not know are the crawl engine's
+    args, engine_args = parser.parse_known_args()
+    if engine_args and args.command not in ('crawl', 'resume'):
+        parser.error(f"unrecognized arguments: {' '.join(engine_args)}")
+
+    if args.command in ('crawl', 'resume'):
+        engine_args = ['--tables-dir', args.tables_dir, '--pk-dir', args.pk_dir] + engine_args
+        run_crawl(engine_args, resume=args.command == 'resume')
+    elif args.command == 'status':
+        show_status(args.tables_dir, args.pk_dir)
+    elif args.command == 'lookup':
+        start = time.perf_counter()
+        results = lookup(args.kind, args.name, args.db, args.tables_dir, args.pk_dir, args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        for result in results:
+            print(result)
+        log(f"{len(results)} results in {elapsed:.2f} ms")
+    else:
+        export(args.format, args.tables_dir, args.pk_dir, args.force, args.dialect)
+
+if __name__ == "__main__":
+    main()
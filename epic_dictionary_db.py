@@ -0,0 +1,301 @@
+import os
+import re
+import csv
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+
+from epic_log import log
+from epic_table_parser import collapse_repeated_description
+
+# One indexed SQLite database built from the letter files.
+#
+#   tables       - one row per table: letter, column count, primary key column count
+#   columns      - the rows of epic_data_tables/{letter}.csv
+#   primary_keys - the rows of epic_data_primary_keys/pk_{letter}.csv
+#   columns_fts  - FTS5 index over table_name, column_name and description,
+#                  kept in sync by triggers and ranked with BM25
+#   source_files - SHA-256 of each letter file as of the last build
+#
+# A rebuild only reloads the letters whose file hash changed, so refreshing
+# the database after a crawl touches just the letters that were rewritten.
+# Descriptions are stored once, with the doubled halves collapsed.
+#
+# Search queries are words, "quoted phrases" and prefix* terms, all of which
+# must match. Names are split on underscores by the tokenizer, so "csn"
+# finds PAT_ENC_CSN_ID. Matches in column names rank above matches in table
+# names, which rank above matches in descriptions.
+
+DICTIONARY_DB = 'epic_dictionary.db'
+SCHEMA_VERSION = 2
+# BM25 weights of the table_name, column_name and description columns
+SEARCH_WEIGHTS = (2.0, 4.0, 1.0)
+COLUMN_FILE = re.compile(r'^([A-Z]|SPECIAL)\.csv$')
+PK_FILE = re.compile(r'^pk_([A-Z]|SPECIAL)\.csv$')
+
+csv.field_size_limit(sys.maxsize)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tables (
+    table_name         TEXT PRIMARY KEY,
+    letter             TEXT NOT NULL,
+    column_count       INTEGER NOT NULL,
+    primary_key_count  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tables_letter ON tables (letter);
+
+CREATE TABLE IF NOT EXISTS columns (
+    id               INTEGER PRIMARY KEY,
+    letter           TEXT NOT NULL,
+    table_name       TEXT NOT NULL,
+    column_name      TEXT NOT NULL,
+    primary_key      TEXT,
+    ordinal_position INTEGER,
+    type             TEXT,
+    discontinued     TEXT,
+    description      TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS columns_table ON columns (table_name, column_name);
+CREATE INDEX IF NOT EXISTS columns_column ON columns (column_name);
+CREATE INDEX IF NOT EXISTS columns_letter ON columns (letter);
+
+CREATE TABLE IF NOT EXISTS primary_keys (
+    letter           TEXT NOT NULL,
+    table_name       TEXT NOT NULL,
+    column_name      TEXT NOT NULL,
+    ordinal_position INTEGER,
+    PRIMARY KEY (table_name, column_name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS primary_keys_column ON primary_keys (column_name);
+CREATE INDEX IF NOT EXISTS primary_keys_letter ON primary_keys (letter);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS columns_fts USING fts5 (
+    table_name, column_name, description, content='columns', content_rowid='id', prefix='2 3 4'
+);
+CREATE TRIGGER IF NOT EXISTS columns_fts_insert AFTER INSERT ON columns BEGIN
+    INSERT INTO columns_fts (rowid, table_name, column_name, description)
+    VALUES (new.id, new.table_name, new.column_name, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS columns_fts_delete AFTER DELETE ON columns BEGIN
+    INSERT INTO columns_fts (columns_fts, rowid, table_name, column_name, description)
+    VALUES ('delete', old.id, old.table_name, old.column_name, old.description);
+END;
+
+CREATE TABLE IF NOT EXISTS source_files (
+    file_name TEXT PRIMARY KEY,
+    sha256    TEXT NOT NULL
+);
+"""
+
+# Statements that drop the full-text index so an older layout can be recreated
+DROP_FTS = """
+DROP TRIGGER IF EXISTS columns_fts_insert;
+DROP TRIGGER IF EXISTS columns_fts_delete;
+DROP TABLE IF EXISTS columns_fts;
+"""
+
+# Function to open the dictionary database, creating or upgrading the schema if needed
+def connect(path=DICTIONARY_DB):
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version < SCHEMA_VERSION:
+        # Version 1 indexed descriptions only; the index is rebuilt from the columns table
+        conn.executescript(DROP_FTS)
+        conn.executescript(SCHEMA)
+        with conn:
+            conn.execute("INSERT INTO columns_fts (columns_fts) VALUES ('rebuild')")
+            conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    else:
+        conn.executescript(SCHEMA)
+    return conn
+
+# Function to hash a file's contents
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Function to convert an ordinal position, keeping non-numeric values out of the integer column
+def _ordinal(value):
+    return int(value) if value.isdigit() else None
+
+# Function to read the rows of a letter file
+def _read_rows(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+# Function to reload the columns of one letter
+def _load_columns(conn, letter, path):
+    conn.execute('DELETE FROM columns WHERE letter = ?', (letter,))
+    if path:
+        conn.executemany(
+            'INSERT OR IGNORE INTO columns (letter, table_name, column_name, primary_key, ordinal_position, type, discontinued, description) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            ((letter, row['table_name'], row['column_name'], row['primary_key'], _ordinal(row['ordinal_position']),
+              row['type'], row['discontinued'], collapse_repeated_description(row['description']))
+             for row in _read_rows(path))
+        )
+
+# Function to reload the primary keys of one letter
+def _load_primary_keys(conn, letter, path):
+    conn.execute('DELETE FROM primary_keys WHERE letter = ?', (letter,))
+    if path:
+        conn.executemany(
+            'INSERT OR IGNORE INTO primary_keys VALUES (?, ?, ?, ?)',
+            ((letter, row['table_name'], row['column_name'], _ordinal(row['ordinal_position'])) for row in _read_rows(path))
+        )
+
+# Function to recompute the tables relation for some letters
+def _refresh_tables(conn, letters):
+    for letter in letters:
+        conn.execute('DELETE FROM tables WHERE letter = ?', (letter,))
+        conn.execute("""
+            INSERT OR REPLACE INTO tables
+            SELECT table_name, ?, SUM(is_column), SUM(is_key) FROM (
+                SELECT table_name, 1 AS is_column, 0 AS is_key FROM columns WHERE letter = ?
+                UNION ALL
+                SELECT table_name, 0, 1 FROM primary_keys WHERE letter = ?
+            ) GROUP BY table_name
+        """, (letter, letter, letter))
+
+# Function to bring the database up to date with the letter files
+def build_database(tables_dir='epic_data_tables', pk_dir='epic_data_primary_keys', path=DICTIONARY_DB, force=False):
+    """Reload every letter file whose hash changed (all of them with force); returns the reloaded file names"""
+    loaders = ((tables_dir, COLUMN_FILE, _load_columns), (pk_dir, PK_FILE, _load_primary_keys))
+    conn = connect(path)
+    try:
+        known = dict(conn.execute('SELECT file_name, sha256 FROM source_files'))
+        if force:
+            known = {name: None for name in known}
+        reloaded = []
+        touched_letters = set()
+        with conn:
+            for directory, pattern, load in loaders:
+                current = {}
+                for name in sorted(os.listdir(directory)):
+                    match = pattern.match(name)
+                    if match:
+                        current[name] = (match.group(1), os.path.join(directory, name))
+
+                # Changed or new files are reloaded, deleted files are emptied
+                for name in sorted(set(current) | {name for name in known if pattern.match(name)}):
+                    letter = current[name][0] if name in current else pattern.match(name).group(1)
+                    file_path = current[name][1] if name in current else None
+                    sha = file_sha256(file_path) if file_path else None
+                    if sha == known.get(name):
+                        continue
+                    load(conn, letter, file_path)
+                    if sha:
+                        conn.execute('INSERT OR REPLACE INTO source_files VALUES (?, ?)', (name, sha))
+                    else:
+                        conn.execute('DELETE FROM source_files WHERE file_name = ?', (name,))
+                    reloaded.append(name)
+                    touched_letters.add(letter)
+            _refresh_tables(conn, sorted(touched_letters))
+
+        counts = [conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in ('tables', 'columns', 'primary_keys')]
+        log(f"{path}: reloaded {len(reloaded)} files - {counts[0]} tables, {counts[1]} columns, {counts[2]} primary key columns")
+        return reloaded
+    finally:
+        conn.close()
+
+# Function to list the tables that have a column
+def tables_with_column(conn, column_name):
+    return [row[0] for row in conn.execute(
+        'SELECT table_name FROM columns WHERE column_name = ? ORDER BY table_name', (column_name,))]
+
+# Function to get a table's primary key columns in key order
+def primary_key(conn, table_name):
+    return [row[0] for row in conn.execute(
+        'SELECT column_name FROM primary_keys WHERE table_name = ? ORDER BY ordinal_position', (table_name,))]
+
+# Function to get a table's columns in ordinal order
+def table_columns(conn, table_name):
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute('SELECT table_name, column_name, primary_key, ordinal_position, type, discontinued, description '
+                            'FROM columns WHERE table_name = ? ORDER BY ordinal_position', (table_name,))
+        return [dict(row) for row in rows]
+    finally:
+        conn.row_factory = None
+
+# Function to turn a search string into an FTS5 query
+def build_search_query(text):
+    """Quote every word and phrase so FTS5 operators and punctuation are taken literally
+
+    "a b" stays a phrase, a trailing * makes a word a prefix query, and all
+    parts are ANDed.
+    """
+    parts = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        if phrase.strip():
+            parts.append('"' + phrase.strip().replace('"', '""') + '"')
+        elif word:
+            prefix = word.endswith('*')
+            word = word.rstrip('*').replace('"', '""')
+            if word:
+                parts.append(f'"{word}"' + ('*' if prefix else ''))
+    return ' '.join(parts)
+
+# Function to rank columns against a search string with BM25
+def search(conn, text, limit=20):
+    """Return (table_name, column_name, snippet, score) tuples, best match first"""
+    query = build_search_query(text)
+    if not query:
+        return []
+    # SQLite reads a negative LIMIT as no limit at all
+    limit = max(1, int(limit))
+    weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+    return conn.execute(f"""
+        SELECT c.table_name, c.column_name,
+               snippet(columns_fts, 2, '[', ']', '...', 16),
+               bm25(columns_fts, {weights}) AS score
+        FROM columns_fts JOIN columns c ON c.id = columns_fts.rowid
+        WHERE columns_fts MATCH ? ORDER BY score LIMIT ?
+    """, (query, limit)).fetchall()
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the indexed dictionary database")
+    parser.add_argument('--db', default=DICTIONARY_DB)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help="Reload the letter files that changed since the last build")
+    build_parser.add_argument('--tables-dir', default='epic_data_tables')
+    build_parser.add_argument('--pk-dir', default='epic_data_primary_keys')
+    build_parser.add_argument('--force', action='store_true', help="Reload every letter file")
+    subparsers.add_parser('column', help="Tables that have a column").add_argument('name')
+    subparsers.add_parser('pk', help="Primary key of a table").add_argument('name')
+    subparsers.add_parser('table', help="Columns of a table").add_argument('name')
+    search_parser = subparsers.add_parser('search', help="BM25-ranked search of table names, column names and descriptions")
+    search_parser.add_argument('query')
+    search_parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_database(args.tables_dir, args.pk_dir, args.db, args.force)
+        return
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    start = time.perf_counter()
+    if args.command == 'column':
+        results = tables_with_column(conn, args.name)
+    elif args.command == 'pk':
+        results = primary_key(conn, args.name)
+    elif args.command == 'table':
+        results = [f"{row['ordinal_position']:>4}  {row['column_name']}  {row['type']}" for row in table_columns(conn, args.name)]
+    else:
+        results = [f"{score:7.2f}  {table}.{column}: {' '.join(snippet.split())}"
+                   for table, column, snippet, score in search(conn, args.query, args.limit)]
+    elapsed = (time.perf_counter() - start) * 1000
+    for result in results:
+        print(result)
+    log(f"{len(results)} results in {elapsed:.2f} ms")
+    conn.close()
+
+if __name__ == "__main__":
+    main()
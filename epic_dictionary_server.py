@@ -0,0 +1,214 @@
+import json
+import sqlite3
+import asyncio
+import hashlib
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from epic_log import log
+from epic_arrow_dictionary import source_signatures
+from epic_column_index import COLUMN_INDEX_FILE, open_index
+from epic_data_dictionary import DataDictionary
+from epic_dictionary_db import DICTIONARY_DB, build_database, search
+
+# Local HTTP service over the dictionary, loaded once per process.
+#
+#   GET /tables/{table}        column rows and primary key of a table
+#   GET /pk/{table}            primary key columns of a table
+#   GET /columns/{column}      tables carrying a column (from the column index)
+#   GET /search?q=...&limit=N  BM25 search (from the dictionary database)
+#   GET /health                data generation and cache statistics
+#
+# Every response carries an ETag and a matching If-None-Match gets a 304.
+# Rendered responses are kept in an LRU cache, so hot requests never leave
+# the event loop; misses run on one worker thread, which owns the SQLite
+# connection. A watcher compares the letter files' sizes and mtimes every
+# few seconds and, when they change, refreshes the database and the column
+# index and drops the response cache. DataDictionary reloads its own shards.
+
+class DictionaryService:
+    def __init__(self, tables_dir, pk_dir, db_path, index_path, cache_size):
+        self.tables_dir = tables_dir
+        self.pk_dir = pk_dir
+        self.db_path = db_path
+        self.index_path = index_path
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.hits = self.misses = 0
+        self.generation = 0
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.dictionary = DataDictionary(tables_dir, pk_dir)
+        self.conn = None
+        self.column_index = None
+        self.signatures = None
+
+    def refresh(self):
+        """Bring the database and column index up to date with the letter files (worker thread)"""
+        signatures = source_signatures(self.tables_dir, self.pk_dir)
+        if signatures == self.signatures:
+            return False
+        build_database(self.tables_dir, self.pk_dir, self.db_path)
+        if self.conn is None:
+            self.conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        self.column_index = open_index(self.index_path, self.tables_dir, self.pk_dir)
+        self.signatures = signatures
+        return True
+
+    def render(self, route, name, query):
+        """Return (status, payload) for one request (worker thread)"""
+        if route == 'tables':
+            if name not in self.dictionary:
+                return HTTPStatus.NOT_FOUND, {'error': f"Unknown table {name}"}
+            return HTTPStatus.OK, {'table': name, 'columns': self.dictionary.table(name),
+                                   'primary_key': self.dictionary.primary_key(name)}
+        if route == 'pk':
+            if name not in self.dictionary:
+                return HTTPStatus.NOT_FOUND, {'error': f"Unknown table {name}"}
+            return HTTPStatus.OK, {'table': name, 'primary_key': self.dictionary.primary_key(name)}
+        if route == 'columns':
+            if name not in self.column_index:
+                return HTTPStatus.NOT_FOUND, {'error': f"Unknown column {name}"}
+            tables = [{'table': table, 'ordinal_position': ordinal, 'type': type_name, 'is_pk': is_pk}
+                      for table, ordinal, type_name, is_pk in self.column_index.tables_with_column(name)]
+            return HTTPStatus.OK, {'column': name, 'tables': tables}
+        if route == 'search':
+            text = query.get('q', [''])[0]
+            try:
+                limit = max(1, min(int(query.get('limit', ['20'])[0]), 500))
+            except ValueError:
+                return HTTPStatus.BAD_REQUEST, {'error': "limit must be an integer"}
+            results = [{'table': table, 'column': column, 'snippet': snippet, 'score': score}
+                       for table, column, snippet, score in search(self.conn, text, limit)]
+            return HTTPStatus.OK, {'query': text, 'results': results}
+        return HTTPStatus.NOT_FOUND, {'error': "Unknown endpoint"}
+
+    async def respond(self, target):
+        """Return (status, body, etag) for a request target, from the cache when possible"""
+        key = (self.generation, target)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+        if parts == ['health']:
+            # Never cached - it reports the cache itself
+            payload = {'generation': self.generation, 'cached': len(self.cache), 'hits': self.hits, 'misses': self.misses}
+            return self._encode(HTTPStatus.OK, payload)
+        route = parts[0]
+        name = parts[1] if len(parts) == 2 else ''
+        if (route == 'search') != (len(parts) == 1):
+            return self._encode(HTTPStatus.NOT_FOUND, {'error': "Unknown endpoint"})
+
+        loop = asyncio.get_running_loop()
+        status, payload = await loop.run_in_executor(self.executor, self.render, route, name, parse_qs(url.query))
+        response = self._encode(status, payload)
+        if status == HTTPStatus.OK and key[0] == self.generation:
+            self.cache[key] = response
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return response
+
+    @staticmethod
+    def _encode(status, payload):
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return status, body, '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+    async def watch(self, interval):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await loop.run_in_executor(self.executor, self.refresh):
+                    self.generation += 1
+                    self.cache.clear()
+                    log(f"Letter files changed - reloaded, data generation {self.generation}")
+            except Exception as e:
+                log(f"Reload failed, still serving the previous data: {e}")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                request_line = lines[0].split()
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        field, value = line.split(':', 1)
+                        headers[field.strip().lower()] = value.strip()
+
+                method = request_line[0] if request_line else ''
+                keep_alive = headers.get('connection', '').lower() != 'close' and request_line[-1:] == ['HTTP/1.1']
+                if len(request_line) != 3:
+                    # Blank or malformed request line - answer it and drop the connection
+                    status, body, etag = self._encode(HTTPStatus.BAD_REQUEST, {'error': "Malformed request line"})
+                    keep_alive = False
+                elif method not in ('GET', 'HEAD'):
+                    status, body, etag = self._encode(HTTPStatus.METHOD_NOT_ALLOWED, {'error': "Only GET and HEAD are supported"})
+                else:
+                    status, body, etag = await self.respond(request_line[1])
+
+                if status == HTTPStatus.OK and headers.get('if-none-match') == etag:
+                    status, body = HTTPStatus.NOT_MODIFIED, b''
+                response_headers = [
+                    f"HTTP/1.1 {status.value} {status.phrase}",
+                    "Content-Type: application/json",
+                    f"Content-Length: {len(body)}",
+                    f"ETag: {etag}",
+                    "Connection: " + ("keep-alive" if keep_alive else "close"),
+                ]
+                writer.write(('\r\n'.join(response_headers) + '\r\n\r\n').encode('latin-1'))
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+# Function to run the server until interrupted
+async def serve(host, port, service, reload_interval):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(service.executor, service.refresh)
+    server = await asyncio.start_server(service.handle, host, port)
+    watcher = asyncio.create_task(service.watch(reload_interval))
+    log(f"Serving the dictionary on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP query server over the dictionary")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--tables-dir', default='epic_data_tables')
+    parser.add_argument('--pk-dir', default='epic_data_primary_keys')
+    parser.add_argument('--db', default=DICTIONARY_DB)
+    parser.add_argument('--index', default=COLUMN_INDEX_FILE)
+    parser.add_argument('--cache-size', type=int, default=4096, help="Responses kept in the LRU cache")
+    parser.add_argument('--reload-interval', type=float, default=5.0, help="Seconds between letter file checks")
+    args = parser.parse_args()
+
+    service = DictionaryService(args.tables_dir, args.pk_dir, args.db, args.index, args.cache_size)
+    try:
+        asyncio.run(serve(args.host, args.port, service, args.reload_interval))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import os
+import csv
+import time
+import argparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from lxml.etree import LxmlError
+
+import epic_data_scraper_alphabetical
+import epic_primary_key_scraper
+from epic_letter_writer import LetterWriter
+from epic_log import log
+from epic_data_scraper_alphabetical import build_table_list, group_tables_by_letter
+from epic_page_profile import LeanPageProfile, ensure_summary_header
+from epic_parquet_export import write_letter_partition
+from epic_rate_limiter import AimdRateLimiter
+from epic_snapshot_store import SnapshotStore
+from epic_table_parser import (
+    parse_html_tables,
+    find_column_table,
+    build_column_rows,
+    build_primary_key_rows,
+)
+
+INDEX_URL = "https://open.epic.com/EHITables/GetTable/_index.htm"
+
+# Output layout for each crawl mode: (output dir, letter file prefix, summary file, count column, scraper module)
+MODES = {
+    'columns': ('epic_data_tables', '', 'processing_summary.csv', 'Column_Count', epic_data_scraper_alphabetical),
+    'primary_keys': ('epic_data_primary_keys', 'pk_', 'pk_processing_summary.csv', 'PK_Column_Count', epic_primary_key_scraper),
+}
+
+# Raised when a fetched page does not contain the tables the extractors expect
+class PageParseError(Exception):
+    pass
+
+# Pooled keep-alive HTTP client for the static EHITables pages
+class HttpTableFetcher:
+    def __init__(self, pool_size=16, timeout=30, retries=3, snapshot_store=None, rate_limiter=None):
+        self.timeout = timeout
+        self.snapshot_store = snapshot_store
+        self.rate_limiter = rate_limiter
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET'],
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['User-Agent'] = 'epic-data-dictionary/1.0'
+
+    def _get(self, url, headers=None):
+        """GET paced and measured by the rate limiter, when there is one"""
+        if self.rate_limiter is None:
+            return self.session.get(url, timeout=self.timeout, headers=headers)
+        self.rate_limiter.acquire()
+        start = time.monotonic()
+        try:
+            response = self.session.get(url, timeout=self.timeout, headers=headers)
+        except requests.RequestException:
+            self.rate_limiter.record(time.monotonic() - start, ok=False)
+            raise
+        self.rate_limiter.record(time.monotonic() - start, status=response.status_code)
+        return response
+
+    def fetch(self, url):
+        response = self._get(url)
+        response.raise_for_status()
+        return response.text
+
+    def fetch_conditional(self, url, etag='', last_modified=''):
+        """Conditional GET; returns (status_code, html, etag, last_modified) with html None on 304"""
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        response = self._get(url, headers=headers)
+        if response.status_code == 304:
+            return 304, None, etag, last_modified
+        response.raise_for_status()
+        return (
+            response.status_code,
+            response.text,
+            response.headers.get('ETag', ''),
+            response.headers.get('Last-Modified', ''),
+        )
+
+    def fetch_tables(self, table_name, url):
+        """Fetch a page and parse its tables, raising PageParseError if there is no column table"""
+        html = self.fetch(url)
+        if self.snapshot_store:
+            self.snapshot_store.put(table_name, url, html)
+        tables = parse_html_tables(html)
+        if not find_column_table(tables):
+            raise PageParseError(f"No column information table found at {url}")
+        return tables
+
+    def fetch_index(self):
+        """Return the unique (table_name, url) list from the index page"""
+        import lxml.html
+        document = lxml.html.fromstring(self.fetch(INDEX_URL))
+        links = [(a.get('href'), a.text_content()) for a in document.iter('a')
+                 if '.htm' in (a.get('href') or '')]
+        log(f"Found {len(links)} potential links")
+        return build_table_list(links)
+
+    def close(self):
+        self.session.close()
+
+# Function to extract column data over HTTP - same rows as extract_table_data
+def fetch_table_data(fetcher, table_name, url):
+    return build_column_rows(fetcher.fetch_tables(table_name, url), table_name)
+
+# Function to extract primary key data over HTTP - same rows as extract_primary_key_data
+def fetch_primary_key_data(fetcher, table_name, url):
+    return build_primary_key_rows(fetcher.fetch_tables(table_name, url), table_name)
+
+# Browser fallback for pages that fail to parse; Chromium is only launched on first use
+class PlaywrightFallback:
+    def __init__(self, mode):
+        self.mode = mode
+        self.playwright = None
+        self.browser = None
+        self.page = None
+        self.page_profile = LeanPageProfile()
+
+    def extract(self, table_name, url):
+        if self.page is None:
+            from playwright.sync_api import sync_playwright
+            log("Launching headless browser for fallback extraction...")
+            self.playwright = sync_playwright().start()
+            self.browser = self.playwright.chromium.launch(headless=True)
+            self.page = self.browser.new_context().new_page()
+            self.page_profile.apply(self.page)
+        if self.mode == 'columns':
+            return epic_data_scraper_alphabetical.extract_table_data(self.page, table_name, url, page_profile=self.page_profile)
+        return epic_primary_key_scraper.extract_primary_key_data(self.page, table_name, url, page_profile=self.page_profile)
+
+    def close(self):
+        if self.browser is not None:
+            self.browser.close()
+            self.playwright.stop()
+
+# Function to fetch one table over HTTP; returns (rows, status, error, seconds)
+def fetch_one(fetcher, mode, table_name, url):
+    start_time = datetime.now()
+    extract = fetch_table_data if mode == 'columns' else fetch_primary_key_data
+    try:
+        rows = extract(fetcher, table_name, url)
+        status, error = ("Success" if rows else "No Data"), ""
+    except (PageParseError, LxmlError) as e:
+        # An empty or garbled body (lxml raises ParserError) goes to the browser fallback too
+        rows, status, error = [], "Parse Error", str(e) or type(e).__name__
+    except requests.RequestException as e:
+        rows, status, error = [], "Error", str(e)
+    return rows, status, error, (datetime.now() - start_time).total_seconds()
+
+# Process tables for a specific letter over pooled HTTP connections
+def process_letter_tables_http(fetcher, fallback, executor, mode, letter, letter_tables, output_dir):
+    _, prefix, summary_name, _, scraper = MODES[mode]
+    log(f"PROCESSING LETTER '{letter}' - {len(letter_tables)} tables")
+
+    # Rows are streamed to the letter file's .partial table by table; a rerun skips tables already in it
+    letter_writer = LetterWriter(os.path.join(output_dir, f"{prefix}{letter}.csv"), scraper.columns)
+    written_tables = letter_writer.open()
+    letter_tables = [(name, url) for name, url in letter_tables if name not in written_tables]
+
+    futures = [executor.submit(fetch_one, fetcher, mode, table_name, url) for table_name, url in letter_tables]
+
+    total_success = 0
+    total_error = 0
+    with open(os.path.join(output_dir, summary_name), 'a', newline='') as f:
+        writer = csv.writer(f)
+        for (table_name, url), future in zip(letter_tables, futures):
+            rows, status, error, processing_time = future.result()
+
+            # Pages that did not parse are retried in the browser from this thread
+            if status == "Parse Error":
+                log(f"  ! {table_name} did not parse, falling back to Playwright")
+                start_time = datetime.now()
+                rows = fallback.extract(table_name, url)
+                status, error = ("Success" if rows else "No Data"), ""
+                processing_time += (datetime.now() - start_time).total_seconds()
+
+            if rows:
+                letter_writer.append(table_name, rows)
+                total_success += 1
+            else:
+                total_error += 1
+                log(f"  ! {table_name}: {status} {error}")
+            writer.writerow([letter, table_name, len(rows), status, error, processing_time, '', ''])
+            scraper.crawl_state(output_dir).record_table(letter, table_name, status, len(rows), error, processing_time, url)
+
+    # Move the finished letter file into place
+    total_rows = letter_writer.finalize()
+    if total_rows:
+        log(f"Saved {total_rows} rows to {letter_writer.letter_file}")
+    else:
+        log(f"No data extracted for letter '{letter}'. CSV file not created.")
+    if mode == 'columns':
+        write_letter_partition(output_dir, letter)
+
+    log(f"Letter '{letter}' processing complete: {total_success} successful, {total_error} failed")
+    return total_success, total_error
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Crawl the Epic EHI tables over HTTP without a browser")
+    parser.add_argument('--mode', choices=sorted(MODES), default='columns')
+    parser.add_argument('--output-dir', default=None)
+    parser.add_argument('--workers', type=int, default=16, help="Concurrent HTTP requests (and pooled connections)")
+    parser.add_argument('--max-rate', type=float, default=50.0, help="Upper bound on requests/second")
+    parser.add_argument('--snapshot-dir', default='epic_html_snapshots')
+    parser.add_argument('--no-snapshot', action='store_true', help="Do not store fetched pages")
+    args = parser.parse_args()
+
+    default_dir, _, summary_name, count_column, scraper = MODES[args.mode]
+    output_dir = args.output_dir or default_dir
+    os.makedirs(output_dir, exist_ok=True)
+
+    print("\n" + "="*70)
+    print(f"EPIC EHI TABLES HTTP EXTRACTION - {args.mode.upper()}")
+    print("="*70 + "\n")
+
+    alphabet = list('ABCDEFGHIJKLMNOPQRSTUVWXYZ') + ['SPECIAL']
+    processed_letters, _ = scraper.load_progress(output_dir)
+
+    # Create summary file header if doesn't exist, with the profile columns the browser crawlers add
+    summary_file = os.path.join(output_dir, summary_name)
+    ensure_summary_header(summary_file, ['Letter', 'Table_Name', count_column, 'Status', 'Error', 'Processing_Time'])
+
+    snapshot_store = None if args.no_snapshot else SnapshotStore(args.snapshot_dir)
+    rate_limiter = AimdRateLimiter(max_rate=args.max_rate)
+    fetcher = HttpTableFetcher(pool_size=args.workers, snapshot_store=snapshot_store, rate_limiter=rate_limiter)
+    fallback = PlaywrightFallback(args.mode)
+    try:
+        letter_groups = group_tables_by_letter(fetcher.fetch_index(), alphabet)
+
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            for letter in alphabet:
+                if letter in processed_letters or not letter_groups.get(letter):
+                    continue
+                process_letter_tables_http(
+                    fetcher, fallback, executor, args.mode, letter, letter_groups[letter], output_dir
+                )
+                processed_letters.add(letter)
+                scraper.save_progress(output_dir, processed_letters)
+
+        log("PROCESSING COMPLETE")
+        rate_limiter.log_stats()
+        log(f"Results saved to {output_dir}/ folder")
+    finally:
+        fallback.close()
+        fetcher.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import os
+import re
+import csv
+import sys
+import hashlib
+import argparse
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from lxml.etree import LxmlError
+
+from epic_log import log
+from epic_data_scraper_alphabetical import group_tables_by_letter
+from epic_http_fetcher import MODES, HttpTableFetcher, PlaywrightFallback
+from epic_page_profile import ensure_summary_header
+from epic_parquet_export import write_letter_partition
+from epic_rate_limiter import AimdRateLimiter
+from epic_snapshot_store import SnapshotStore
+from epic_table_parser import parse_html_tables, find_column_table, build_column_rows, build_primary_key_rows
+
+# A few descriptions are several hundred KB, past the csv module's default field limit
+csv.field_size_limit(sys.maxsize)
+
+# Per-table validators and content hashes kept between weekly refreshes
+STATE_FILE = 'incremental_state.csv'
+STATE_COLUMNS = ['table_name', 'letter', 'url', 'etag', 'last_modified', 'content_hash', 'checked_at']
+
+BUILDERS = {'columns': build_column_rows, 'primary_keys': build_primary_key_rows}
+
+_TABLES = re.compile(r'<table\b.*</table>', re.IGNORECASE | re.DOTALL)
+_WHITESPACE = re.compile(r'\s+')
+
+# Function to hash the table markup of a page, ignoring layout whitespace and page chrome
+def table_content_hash(html):
+    match = _TABLES.search(html)
+    tables_html = match.group(0) if match else ''
+    normalized = _WHITESPACE.sub(' ', tables_html).replace('> <', '><')
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+# Function to load the incremental state
+def load_incremental_state(output_dir):
+    state = {}
+    state_file = os.path.join(output_dir, STATE_FILE)
+    if os.path.exists(state_file):
+        with open(state_file, newline='') as f:
+            for row in csv.DictReader(f):
+                state[row['table_name']] = row
+        log(f"Loaded incremental state for {len(state)} tables")
+    return state
+
+# Function to save the incremental state atomically
+def save_incremental_state(output_dir, state):
+    state_file = os.path.join(output_dir, STATE_FILE)
+    tmp_file = state_file + '.tmp'
+    with open(tmp_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=STATE_COLUMNS)
+        writer.writeheader()
+        for table_name in sorted(state):
+            writer.writerow(state[table_name])
+    os.replace(tmp_file, state_file)
+
+# Function to check one table; returns (status, rows, new state entry, error, seconds)
+def check_table(fetcher, mode, letter, table_name, url, entry):
+    start_time = datetime.now()
+    status, rows, entry, error = _check_table(fetcher, mode, letter, table_name, url, entry)
+    return status, rows, entry, error, (datetime.now() - start_time).total_seconds()
+
+def _check_table(fetcher, mode, letter, table_name, url, entry):
+    entry = dict(entry or {'table_name': table_name, 'etag': '', 'last_modified': '', 'content_hash': ''})
+    entry.update({'letter': letter, 'url': url, 'checked_at': datetime.now().isoformat(timespec='seconds')})
+    try:
+        status_code, html, etag, last_modified = fetcher.fetch_conditional(
+            url, entry.get('etag', ''), entry.get('last_modified', '')
+        )
+    except requests.RequestException as e:
+        return "Error", [], None, str(e)
+
+    # 304 Not Modified - nothing was downloaded, nothing to parse
+    if status_code == 304:
+        return "Unchanged", [], entry, ""
+
+    entry['etag'], entry['last_modified'] = etag, last_modified
+    content_hash = table_content_hash(html)
+
+    # The server re-sent the page but its tables are the same
+    if content_hash == entry.get('content_hash'):
+        return "Unchanged", [], entry, ""
+
+    if fetcher.snapshot_store:
+        fetcher.snapshot_store.put(table_name, url, html)
+
+    entry['content_hash'] = content_hash
+    try:
+        tables = parse_html_tables(html)
+    except LxmlError as e:
+        return "Parse Error", [], entry, str(e) or type(e).__name__
+    if not find_column_table(tables):
+        return "Parse Error", [], entry, f"No column information table found at {url}"
+
+    rows = BUILDERS[mode](tables, table_name)
+    return ("Success" if rows else "No Data"), rows, entry, ""
+
+# Function to rewrite one letter file, replacing the rows of changed and removed tables
+def rewrite_letter_file(letter_file, csv_columns, letter_tables, changed_rows, removed_tables):
+    existing = {}
+    if os.path.exists(letter_file):
+        with open(letter_file, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                existing.setdefault(row['table_name'], []).append(row)
+
+    # Keep tables in index order; tables not in the index are dropped
+    total = 0
+    tmp_file = letter_file + '.tmp'
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=csv_columns, extrasaction='ignore')
+        writer.writeheader()
+        for table_name, _ in letter_tables:
+            if table_name in removed_tables:
+                continue
+            rows = changed_rows[table_name] if table_name in changed_rows else existing.get(table_name, [])
+            writer.writerows(rows)
+            total += len(rows)
+    os.replace(tmp_file, letter_file)
+    return total
+
+# Function to run one incremental refresh
+def refresh(fetcher, fallback, executor, mode, output_dir, alphabet):
+    _, prefix, summary_name, _, scraper = MODES[mode]
+    state = load_incremental_state(output_dir)
+    letter_groups = group_tables_by_letter(fetcher.fetch_index(), alphabet)
+
+    index_tables = {name for tables in letter_groups.values() for name, _ in tables}
+    removed_tables = set(state) - index_tables
+    counts = {"Unchanged": 0, "Success": 0, "No Data": 0, "Error": 0}
+
+    with open(os.path.join(output_dir, summary_name), 'a', newline='') as summary:
+        summary_writer = csv.writer(summary)
+
+        for letter in alphabet:
+            letter_tables = letter_groups.get(letter, [])
+            letter_removed = {name for name in removed_tables if state[name].get('letter') == letter}
+            if not letter_tables and not letter_removed:
+                continue
+
+            futures = [
+                executor.submit(check_table, fetcher, mode, letter, table_name, url, state.get(table_name))
+                for table_name, url in letter_tables
+            ]
+
+            changed_rows = {}
+            for (table_name, url), future in zip(letter_tables, futures):
+                status, rows, entry, error, processing_time = future.result()
+
+                # Pages that did not parse are retried in the browser from this thread
+                if status == "Parse Error":
+                    start_time = datetime.now()
+                    rows = fallback.extract(table_name, url)
+                    processing_time += (datetime.now() - start_time).total_seconds()
+                    if rows:
+                        status, error = "Success", ""
+                    else:
+                        # The browser got nothing either: keep the table's current rows
+                        # and force a full fetch next time
+                        status, error = "Error", f"{error}; browser fallback found no data"
+                        entry.update({'etag': '', 'last_modified': '', 'content_hash': ''})
+
+                if status in ("Success", "No Data"):
+                    changed_rows[table_name] = rows
+                if entry is not None:
+                    state[table_name] = entry
+                counts[status] += 1
+
+                if status != "Unchanged":
+                    summary_writer.writerow([letter, table_name, len(rows), status, error, processing_time, '', ''])
+
+            # Only letters whose tables actually changed are rewritten
+            if changed_rows or letter_removed:
+                letter_file = os.path.join(output_dir, f"{prefix}{letter}.csv")
+                total = rewrite_letter_file(letter_file, scraper.columns, letter_tables, changed_rows, letter_removed)
+                log(f"Letter '{letter}': {len(changed_rows)} changed, {len(letter_removed)} removed - rewrote {letter_file} ({total} rows)")
+                if mode == 'columns':
+                    write_letter_partition(output_dir, letter)
+            else:
+                log(f"Letter '{letter}': unchanged")
+
+            for table_name in letter_removed:
+                del state[table_name]
+
+            # Save after every letter so an interrupted refresh keeps its progress
+            save_incremental_state(output_dir, state)
+
+    log(f"Refresh complete: {counts['Unchanged']} unchanged, {counts['Success']} changed, "
+        f"{counts['No Data']} no data, {counts['Error']} errors, {len(removed_tables)} removed")
+    return counts
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Incremental refresh of the Epic EHI tables using conditional GETs")
+    parser.add_argument('--mode', choices=sorted(MODES), default='columns')
+    parser.add_argument('--output-dir', default=None)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--max-rate', type=float, default=50.0, help="Upper bound on requests/second")
+    parser.add_argument('--snapshot-dir', default='epic_html_snapshots')
+    parser.add_argument('--no-snapshot', action='store_true', help="Do not store changed pages")
+    args = parser.parse_args()
+
+    default_dir, _, summary_name, count_column, _ = MODES[args.mode]
+    output_dir = args.output_dir or default_dir
+    os.makedirs(output_dir, exist_ok=True)
+
+    print("\n" + "="*70)
+    print(f"EPIC EHI TABLES INCREMENTAL REFRESH - {args.mode.upper()}")
+    print("="*70 + "\n")
+
+    # Create summary file header if doesn't exist, with the profile columns the browser crawlers add
+    summary_file = os.path.join(output_dir, summary_name)
+    ensure_summary_header(summary_file, ['Letter', 'Table_Name', count_column, 'Status', 'Error', 'Processing_Time'])
+
+    alphabet = list('ABCDEFGHIJKLMNOPQRSTUVWXYZ') + ['SPECIAL']
+    snapshot_store = None if args.no_snapshot else SnapshotStore(args.snapshot_dir)
+    rate_limiter = AimdRateLimiter(max_rate=args.max_rate)
+    fetcher = HttpTableFetcher(pool_size=args.workers, snapshot_store=snapshot_store, rate_limiter=rate_limiter)
+    fallback = PlaywrightFallback(args.mode)
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            refresh(fetcher, fallback, executor, args.mode, output_dir, alphabet)
+        rate_limiter.log_stats()
+    finally:
+        fallback.close()
+        fetcher.close()
+
+if __name__ == "__main__":
+    main()
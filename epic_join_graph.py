@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+from itertools import chain
+
+from epic_log import log
+from epic_arrow_dictionary import build_table, source_signatures
+
+# Join graph between tables, inferred from shared key columns.
+#
+# Two tables can be joined on column C when both have C and C is the leading
+# primary key column of at least one of them (a PAT_ENC_CSN_ID column joins
+# to PAT_ENC, whose key starts with PAT_ENC_CSN_ID). Columns that only ever
+# appear further down a key, like LINE, never produce edges, and
+# EXCLUDED_COLUMNS drops leading key names that mean something different in
+# every table.
+#
+# Instead of materializing over a million table-to-table edges, the graph keeps
+# three CSR adjacency lists - table -> columns, column -> tables that have it,
+# column -> tables keyed by it - and expands edges on the fly during a
+# bidirectional breadth-first search. Connected components are precomputed,
+# so a query for two unconnected tables returns without searching. Among
+# equally short paths, joins into the table a column keys are preferred.
+
+JOIN_GRAPH_FILE = 'epic_join_graph.npz'
+# RECORD_ID is the ID of whichever master file a table belongs to
+EXCLUDED_COLUMNS = ('RECORD_ID',)
+
+# Function to build CSR arrays from (row, value) pairs
+def _csr(rows, values, row_count):
+    order = np.lexsort((values, rows))
+    indptr = np.zeros(row_count + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=row_count), out=indptr[1:])
+    return indptr, values[order].astype(np.int32)
+
+# Function to label connected components with union-find over the key columns
+def _components(table_count, column_tables, column_keyed):
+    parent = list(range(table_count))
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    # Every table having a column joins every table keyed by it, so the whole
+    # membership list of a column with any keyed table is one component
+    for members, keyed in zip(column_tables, column_keyed):
+        if keyed:
+            root = find(keyed[0])
+            for table in members:
+                other = find(table)
+                if other != root:
+                    parent[other] = root
+
+    roots = [find(table) for table in range(table_count)]
+    _, labels = np.unique(roots, return_inverse=True)
+    return labels.astype(np.int32)
+
+# Function to build the join graph and save it
+def build_join_graph(tables_dir='epic_data_tables', pk_dir='epic_data_primary_keys', path=JOIN_GRAPH_FILE,
+                     excluded_columns=EXCLUDED_COLUMNS):
+    signatures = source_signatures(tables_dir, pk_dir)
+    dictionary = build_table(tables_dir, pk_dir).select(['table_name', 'column_name', 'pk_ordinal_position'])
+    table_names = dictionary.column('table_name').to_numpy(zero_copy_only=False).astype(str)
+    column_names = dictionary.column('column_name').to_numpy(zero_copy_only=False).astype(str)
+    pk_positions = dictionary.column('pk_ordinal_position').to_numpy(zero_copy_only=False)
+
+    tables, table_ids = np.unique(table_names, return_inverse=True)
+    columns, column_ids = np.unique(column_names, return_inverse=True)
+
+    # The leading key column of a table is its primary key column with the lowest position
+    is_key = ~np.isnan(pk_positions.astype(float))
+    key_rows = np.flatnonzero(is_key)
+    key_rows = key_rows[np.lexsort((pk_positions[key_rows].astype(float), table_ids[key_rows]))]
+    leading = key_rows[np.r_[True, table_ids[key_rows][1:] != table_ids[key_rows][:-1]]] if len(key_rows) else key_rows
+    table_key = np.full(len(tables), -1, dtype=np.int32)
+    table_key[table_ids[leading]] = column_ids[leading]
+    excluded = np.isin(columns, list(excluded_columns))
+    table_key[(table_key >= 0) & excluded[np.maximum(table_key, 0)]] = -1
+
+    # Only columns that lead some table's key can form edges
+    join_column = np.zeros(len(columns), dtype=bool)
+    join_column[table_key[table_key >= 0]] = True
+    members = np.unique(np.stack([table_ids, column_ids], axis=1)[join_column[column_ids]], axis=0)
+    keyed = np.flatnonzero(table_key >= 0)
+
+    table_columns_ptr, table_columns = _csr(members[:, 0], members[:, 1], len(tables))
+    column_tables_ptr, column_tables = _csr(members[:, 1], members[:, 0], len(columns))
+    column_keyed_ptr, column_keyed = _csr(table_key[keyed], keyed, len(columns))
+
+    graph = JoinGraph(tables, columns, table_key, table_columns_ptr, table_columns, column_tables_ptr,
+                      column_tables, column_keyed_ptr, column_keyed, None)
+    graph.component = _components(len(tables), graph.column_tables, graph.column_keyed)
+
+    tmp_path = path + '.tmp.npz'
+    np.savez_compressed(tmp_path, tables=tables, columns=columns, table_key=table_key,
+                        table_columns_ptr=table_columns_ptr, table_columns=table_columns,
+                        column_tables_ptr=column_tables_ptr, column_tables=column_tables,
+                        column_keyed_ptr=column_keyed_ptr, column_keyed=column_keyed,
+                        component=graph.component, sources=np.array(json.dumps(signatures)))
+    os.replace(tmp_path, path)
+
+    component_count = len(np.unique(graph.component))
+    log(f"Wrote {path}: {len(tables)} tables, {int(join_column.sum())} join columns, "
+        f"{len(members)} memberships, {component_count} components")
+    return graph
+
+# Function to split CSR arrays into per-row Python lists for fast traversal
+def _rows(indptr, indices):
+    indices = indices.tolist()
+    bounds = indptr.tolist()
+    return [indices[start:end] for start, end in zip(bounds, bounds[1:])]
+
+class JoinGraph:
+    def __init__(self, tables, columns, table_key, table_columns_ptr, table_columns, column_tables_ptr,
+                 column_tables, column_keyed_ptr, column_keyed, component, sources=None):
+        self.tables = tables.tolist()
+        self.columns = columns.tolist()
+        self.table_index = {name: position for position, name in enumerate(self.tables)}
+        self.table_key = table_key.tolist()
+        self.table_columns = _rows(table_columns_ptr, table_columns)
+        self.column_tables = _rows(column_tables_ptr, column_tables)
+        self.column_keyed = _rows(column_keyed_ptr, column_keyed)
+        self.component = component
+        self.sources = sources
+
+    @classmethod
+    def load(cls, path=JOIN_GRAPH_FILE):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        sources = json.loads(str(arrays.pop('sources')))
+        return cls(sources=sources, **arrays)
+
+    def is_stale(self, tables_dir='epic_data_tables', pk_dir='epic_data_primary_keys'):
+        return self.sources != source_signatures(tables_dir, pk_dir)
+
+    def neighbors(self, table):
+        """Yield (column index, table index) for every table one join away"""
+        key = self.table_key[table]
+        for column in self.table_columns[table]:
+            # Tables keyed by the column come first, then the rest of its members
+            others = chain(self.column_keyed[column], self.column_tables[column]) if column == key else self.column_keyed[column]
+            for other in others:
+                if other != table:
+                    yield column, other
+
+    def shortest_path(self, source_table, target_table):
+        """Return the hops [(table, column, next_table), ...] of a shortest join path, or None
+
+        Raises KeyError naming the table when either table is unknown.
+        """
+        for table_name in (source_table, target_table):
+            if table_name not in self.table_index:
+                raise KeyError(f"Unknown table {table_name}")
+        source, target = self.table_index[source_table], self.table_index[target_table]
+        if source == target:
+            return []
+        if self.component[source] != self.component[target]:
+            return None
+
+        # Search from both ends, always expanding the smaller frontier
+        previous = {source: None}
+        following = {target: None}
+        frontiers = ([source], [target])
+        meeting = None
+        while meeting is None and frontiers[0] and frontiers[1]:
+            forward = len(frontiers[0]) <= len(frontiers[1])
+            seen, other_side = (previous, following) if forward else (following, previous)
+            next_frontier = []
+            for table in frontiers[0 if forward else 1]:
+                for column, other in self.neighbors(table):
+                    if other not in seen:
+                        seen[other] = (table, column)
+                        next_frontier.append(other)
+                        if other in other_side:
+                            meeting = other
+                            break
+                if meeting is not None:
+                    break
+            frontiers = (next_frontier, frontiers[1]) if forward else (frontiers[0], next_frontier)
+        if meeting is None:
+            return None
+
+        hops = []
+        node = meeting
+        while previous[node] is not None:
+            table, column = previous[node]
+            hops.append((self.tables[table], self.columns[column], self.tables[node]))
+            node = table
+        hops.reverse()
+        node = meeting
+        while following[node] is not None:
+            table, column = following[node]
+            hops.append((self.tables[node], self.columns[column], self.tables[table]))
+            node = table
+        return hops
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the table join graph")
+    parser.add_argument('--graph', default=JOIN_GRAPH_FILE)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help="Infer the join graph from the column and primary key files")
+    build_parser.add_argument('--tables-dir', default='epic_data_tables')
+    build_parser.add_argument('--pk-dir', default='epic_data_primary_keys')
+    build_parser.add_argument('--exclude-column', action='append', metavar='COLUMN',
+                              help=f"Leading key column that never forms joins (repeatable; default: {', '.join(EXCLUDED_COLUMNS)})")
+    path_parser = subparsers.add_parser('path', help="Shortest join path between two tables")
+    path_parser.add_argument('source')
+    path_parser.add_argument('target')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_join_graph(args.tables_dir, args.pk_dir, args.graph, tuple(args.exclude_column or EXCLUDED_COLUMNS))
+        return
+
+    graph = JoinGraph.load(args.graph)
+    start = time.perf_counter()
+    try:
+        hops = graph.shortest_path(args.source, args.target)
+    except KeyError as e:
+        print(e.args[0])
+        return
+    elapsed = (time.perf_counter() - start) * 1000
+    if hops is None:
+        print(f"No join path between {args.source} and {args.target}")
+    for table, column, next_table in hops or []:
+        print(f"{table} -[{column}]-> {next_table}")
+    log(f"Searched in {elapsed:.2f} ms")
+
+if __name__ == "__main__":
+    main()
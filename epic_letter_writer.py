@@ -0,0 +1,125 @@
+import io
+import os
+import csv
+import sys
+
+from epic_log import log
+
+# A few descriptions are several hundred KB, past the csv module's default field limit
+csv.field_size_limit(sys.maxsize)
+
+# Streaming output for one letter file.
+#
+# Rows are appended to {letter_file}.partial as soon as a table is extracted,
+# one write + fsync per table, so a crash loses at most the table being
+# written. finalize() renames the partial file over {letter_file} atomically.
+#
+# When a partial file is left over from an interrupted run, open() keeps its
+# rows and reports which tables are already written so the caller can skip
+# them. The last table in the file may have been cut short by the crash, so
+# it is dropped and crawled again.
+
+class LetterWriter:
+    def __init__(self, letter_file, columns):
+        self.letter_file = letter_file
+        self.partial_file = letter_file + '.partial'
+        self.columns = columns
+        self.file = None
+        self.tables = set()
+        self.rows_written = 0
+        # Out-of-order results waiting for the tables before them
+        self.pending = {}
+        self.next_position = 0
+
+    def open(self, keep=None):
+        """Open the partial file and return the set of tables already in it
+
+        By default the last table of a leftover partial file is dropped; pass
+        keep to instead retain exactly the rows of those tables.
+        """
+        if os.path.exists(self.partial_file):
+            self._recover(keep)
+            self.file = open(self.partial_file, 'a', newline='', encoding='utf-8')
+            if self.tables:
+                log(f"Resuming {self.partial_file}: {len(self.tables)} tables, {self.rows_written} rows already written")
+        else:
+            self.file = open(self.partial_file, 'w', newline='', encoding='utf-8')
+            csv.writer(self.file).writerow(self.columns)
+            self._sync()
+        return set(self.tables)
+
+    def _read_tables(self):
+        """Yield the complete rows of the partial file, stopping at a torn last line"""
+        with open(self.partial_file, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            try:
+                for row in reader:
+                    if None in row or None in row.values():
+                        break
+                    yield row
+            except csv.Error:
+                return
+
+    def _recover(self, keep):
+        # First pass finds the table order, the second copies the rows worth keeping
+        if keep is None:
+            order = []
+            for row in self._read_tables():
+                if not order or order[-1] != row['table_name']:
+                    order.append(row['table_name'])
+            keep = set(order[:-1])
+
+        tmp_file = self.partial_file + '.tmp'
+        with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns)
+            writer.writeheader()
+            for row in self._read_tables():
+                if row['table_name'] in keep:
+                    writer.writerow(row)
+                    self.tables.add(row['table_name'])
+                    self.rows_written += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.partial_file)
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def append(self, table_name, rows):
+        """Durably append one table's rows"""
+        if not rows:
+            return
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, fieldnames=self.columns, extrasaction='ignore').writerows(rows)
+        self.file.write(buffer.getvalue())
+        self._sync()
+        self.tables.add(table_name)
+        self.rows_written += len(rows)
+
+    def add(self, position, table_name, rows):
+        """Append a table's rows in position order, holding back results that arrive early
+
+        Every position from 0 up must be added, with an empty list for tables without rows.
+        """
+        self.pending[position] = (table_name, rows)
+        while self.next_position in self.pending:
+            self.append(*self.pending.pop(self.next_position))
+            self.next_position += 1
+
+    def finalize(self):
+        """Close the partial file and atomically move it over the letter file; returns the row count"""
+        for position in sorted(self.pending):
+            self.append(*self.pending.pop(position))
+        self.file.close()
+        if self.rows_written:
+            os.replace(self.partial_file, self.letter_file)
+            # Make the rename itself durable
+            dir_fd = os.open(os.path.dirname(os.path.abspath(self.letter_file)), os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        else:
+            os.remove(self.partial_file)
+        return self.rows_written
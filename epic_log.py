@@ -0,0 +1,9 @@
+import sys
+from datetime import datetime
+
+# Function to print with timestamp
+def log(message):
+    """Print a message with timestamp and immediately flush output"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}")
+    sys.stdout.flush()
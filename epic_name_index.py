@@ -0,0 +1,158 @@
+import os
+import re
+import json
+import time
+import argparse
+import numpy as np
+
+from epic_log import log
+from epic_data_dictionary import source_signatures
+
+# Trigram index for fuzzy table and column name lookup.
+#
+# Names are split into words on anything that is not a letter or digit, and
+# every word is padded with two spaces in front and one behind before it is
+# cut into trigrams, so ABN_DOCUMENT_ID gives '  A', ' AB', 'ABN', 'BN ', ...
+# The similarity of two names is the share of their distinct trigrams that
+# they have in common (shared / union), as in PostgreSQL's pg_trgm.
+#
+# epic_name_index.npz keeps the names, the trigram vocabulary and a CSR
+# posting list from each trigram to the names that contain it. A query looks
+# up the postings of its own trigrams and counts them with one bincount, so
+# it touches only names that share at least one trigram instead of running an
+# edit distance against every name.
+
+NAME_INDEX_FILE = 'epic_name_index.npz'
+KINDS = ('table', 'column')
+
+# Function to get the distinct trigrams of a name
+def trigrams(name):
+    found = set()
+    for word in re.findall(r'[A-Z0-9]+', name.upper()):
+        padded = '  ' + word + ' '
+        found.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return found
+
+# Function to build the name index from the letter files and save it
+def build_name_index(tables_dir='epic_data_tables', pk_dir='epic_data_primary_keys', path=NAME_INDEX_FILE):
+    # PyArrow is only needed to rebuild, not to query
+    from epic_arrow_dictionary import build_table
+
+    signatures = source_signatures(tables_dir, pk_dir)
+    dictionary = build_table(tables_dir, pk_dir).select(['table_name', 'column_name'])
+    table_names = np.unique(dictionary.column('table_name').to_numpy(zero_copy_only=False).astype(str))
+    column_names = np.unique(dictionary.column('column_name').to_numpy(zero_copy_only=False).astype(str))
+    names = np.concatenate([table_names, column_names])
+    kinds = np.repeat(np.arange(len(KINDS), dtype=np.int8), [len(table_names), len(column_names)])
+
+    vocabulary = {}
+    name_ids, gram_ids = [], []
+    trigram_counts = np.zeros(len(names), dtype=np.int32)
+    for name_id, name in enumerate(names.tolist()):
+        grams = trigrams(name)
+        trigram_counts[name_id] = len(grams)
+        for gram in grams:
+            name_ids.append(name_id)
+            gram_ids.append(vocabulary.setdefault(gram, len(vocabulary)))
+    name_ids = np.array(name_ids, dtype=np.int32)
+    gram_ids = np.array(gram_ids, dtype=np.int32)
+
+    order = np.lexsort((name_ids, gram_ids))
+    postings_ptr = np.zeros(len(vocabulary) + 1, dtype=np.int32)
+    np.cumsum(np.bincount(gram_ids, minlength=len(vocabulary)), out=postings_ptr[1:])
+    postings = name_ids[order]
+
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, names=names, kinds=kinds, trigram_counts=trigram_counts, grams=np.array(list(vocabulary)),
+             postings_ptr=postings_ptr, postings=postings, sources=np.array(json.dumps(signatures)))
+    os.replace(tmp_path, path)
+    log(f"Wrote {path}: {len(table_names)} tables, {len(column_names)} columns, "
+        f"{len(vocabulary)} trigrams, {len(postings)} postings")
+
+class NameIndex:
+    def __init__(self, names, kinds, trigram_counts, grams, postings_ptr, postings, sources=None):
+        self.names = names.tolist()
+        self.kinds = kinds
+        self.trigram_counts = trigram_counts
+        self.gram_ids = {gram: position for position, gram in enumerate(grams.tolist())}
+        self.postings_ptr = postings_ptr
+        self.postings = postings
+        self.sources = sources
+
+    @classmethod
+    def load(cls, path=NAME_INDEX_FILE):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        sources = json.loads(str(arrays.pop('sources')))
+        return cls(sources=sources, **arrays)
+
+    def is_stale(self, tables_dir='epic_data_tables', pk_dir='epic_data_primary_keys'):
+        return self.sources != source_signatures(tables_dir, pk_dir)
+
+    def search(self, text, limit=10, kind=None, threshold=0.3):
+        """Return [(name, kind, similarity), ...] for names at least threshold similar, best first"""
+        query = trigrams(text)
+        if limit < 1:
+            return []
+        gram_ids = [self.gram_ids[gram] for gram in query if gram in self.gram_ids]
+        if not gram_ids:
+            return []
+        shared = np.bincount(np.concatenate([self.postings[self.postings_ptr[gram]:self.postings_ptr[gram + 1]]
+                                             for gram in gram_ids]), minlength=len(self.names))
+        candidates = np.flatnonzero(shared)
+        if kind is not None:
+            candidates = candidates[self.kinds[candidates] == KINDS.index(kind)]
+        scores = shared[candidates] / (len(query) + self.trigram_counts[candidates] - shared[candidates])
+        keep = scores >= threshold
+        candidates, scores = candidates[keep], scores[keep]
+
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            cutoff = scores[top].min()
+            keep = scores >= cutoff
+            candidates, scores = candidates[keep], scores[keep]
+        results = [(self.names[name], KINDS[self.kinds[name]], float(score))
+                   for name, score in zip(candidates.tolist(), scores.tolist())]
+        # Ties go to the name closest in length to the query, then alphabetical order
+        results.sort(key=lambda result: (-result[2], abs(len(result[0]) - len(text)), result[0]))
+        return results[:limit]
+
+# Function to open the index, rebuilding it first when it is missing or stale
+def open_name_index(path=NAME_INDEX_FILE, tables_dir='epic_data_tables', pk_dir='epic_data_primary_keys'):
+    if os.path.exists(path):
+        index = NameIndex.load(path)
+        if not index.is_stale(tables_dir, pk_dir):
+            return index
+        log(f"{path} is older than the letter files, rebuilding it")
+    build_name_index(tables_dir, pk_dir, path)
+    return NameIndex.load(path)
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the trigram index of table and column names")
+    parser.add_argument('--index', default=NAME_INDEX_FILE)
+    parser.add_argument('--tables-dir', default='epic_data_tables')
+    parser.add_argument('--pk-dir', default='epic_data_primary_keys')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('build', help="Rebuild the index from the letter files")
+    search_parser = subparsers.add_parser('search', help="Table and column names similar to a (mistyped) name")
+    search_parser.add_argument('name')
+    search_parser.add_argument('--kind', choices=KINDS, help="Only match table or only column names")
+    search_parser.add_argument('--limit', type=int, default=10)
+    search_parser.add_argument('--threshold', type=float, default=0.3, help="Minimum similarity, 0 to 1")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_name_index(args.tables_dir, args.pk_dir, args.index)
+        return
+
+    index = open_name_index(args.index, args.tables_dir, args.pk_dir)
+    start = time.perf_counter()
+    results = index.search(args.name, args.limit, args.kind, args.threshold)
+    elapsed = (time.perf_counter() - start) * 1000
+    for name, kind, score in results:
+        print(f"{score:5.2f}  {kind:6}  {name}")
+    log(f"{len(results)} matches in {elapsed:.2f} ms")
+
+if __name__ == "__main__":
+    main()
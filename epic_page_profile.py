@@ -0,0 +1,134 @@
+import os
+import csv
+import time
+
+# Lean page loading for the table pages.
+#
+# The extractors only read the <table> DOM, so every request other than the
+# HTML document itself (stylesheets, scripts, fonts, images, XHR...) is
+# aborted, and loads wait for 'domcontentloaded' plus the table selector
+# instead of 'networkidle'.
+#
+# The first `calibration_pages` loads use the full profile so there is a
+# baseline to report savings against; after that each load records the
+# bytes transferred and the seconds saved versus the baseline average.
+
+ALLOWED_RESOURCE_TYPES = {'document'}
+
+# Extra columns appended to processing_summary.csv / pk_processing_summary.csv
+SUMMARY_PROFILE_COLUMNS = ['Bytes_Transferred', 'Time_Saved']
+
+class LeanPageProfile:
+    def __init__(self, calibration_pages=3, timeout=60000, selector_timeout=10000):
+        self.calibration_pages = calibration_pages
+        self.timeout = timeout
+        self.selector_timeout = selector_timeout
+        self.calibrating = calibration_pages > 0
+        self.baseline_seconds = []
+        self.baseline_bytes = []
+        self.finished_requests = []
+        self.blocked = 0
+        self.last_stats = {}
+
+    def _should_block(self, request):
+        return not self.calibrating and request.resource_type not in ALLOWED_RESOURCE_TYPES
+
+    def _route(self, route):
+        if self._should_block(route.request):
+            self.blocked += 1
+            route.abort()
+        else:
+            route.continue_()
+
+    async def _route_async(self, route):
+        if self._should_block(route.request):
+            self.blocked += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def apply(self, page):
+        page.route('**/*', self._route)
+        page.on('requestfinished', self.finished_requests.append)
+
+    async def apply_async(self, page):
+        await page.route('**/*', self._route_async)
+        page.on('requestfinished', self.finished_requests.append)
+
+    def _goto_kwargs(self):
+        wait_until = 'networkidle' if self.calibrating else 'domcontentloaded'
+        return {'timeout': self.timeout, 'wait_until': wait_until}
+
+    def _finish(self, seconds, transferred):
+        """Record one load, updating the baseline while calibrating"""
+        if self.calibrating:
+            self.baseline_seconds.append(seconds)
+            self.baseline_bytes.append(transferred)
+            self.calibrating = len(self.baseline_seconds) < self.calibration_pages
+            saved = 0.0
+        else:
+            saved = sum(self.baseline_seconds) / len(self.baseline_seconds) - seconds if self.baseline_seconds else 0.0
+        self.last_stats = {'bytes': transferred, 'seconds': seconds, 'saved': saved, 'blocked': self.blocked}
+        return self.last_stats
+
+    @staticmethod
+    def _transferred(sizes):
+        return sizes['responseBodySize'] + sizes['responseHeadersSize']
+
+    def load(self, page, url, rate_limiter=None):
+        """Load a table page; returns {'bytes', 'seconds', 'saved', 'blocked'}"""
+        self.finished_requests.clear()
+        self.blocked = 0
+        self.last_stats = {}
+        start = time.monotonic()
+        if rate_limiter:
+            rate_limiter.goto(page, url, **self._goto_kwargs())
+        else:
+            page.goto(url, **self._goto_kwargs())
+        page.wait_for_selector('table', timeout=self.selector_timeout)
+        seconds = time.monotonic() - start
+        transferred = sum(self._transferred(request.sizes()) for request in self.finished_requests)
+        return self._finish(seconds, transferred)
+
+    async def load_async(self, page, url, rate_limiter=None):
+        """Async version of load for pages that have had apply_async called"""
+        self.finished_requests.clear()
+        self.blocked = 0
+        self.last_stats = {}
+        start = time.monotonic()
+        if rate_limiter:
+            await rate_limiter.goto_async(page, url, **self._goto_kwargs())
+        else:
+            await page.goto(url, **self._goto_kwargs())
+        await page.wait_for_selector('table', timeout=self.selector_timeout)
+        seconds = time.monotonic() - start
+        transferred = 0
+        for request in list(self.finished_requests):
+            transferred += self._transferred(await request.sizes())
+        return self._finish(seconds, transferred)
+
+    def summary_values(self):
+        """Bytes_Transferred and Time_Saved values for the last load"""
+        if not self.last_stats:
+            return ['', '']
+        return [self.last_stats['bytes'], round(self.last_stats['saved'], 3)]
+
+# Function to create a summary file, or widen the header of an existing one, to include the profile columns
+def ensure_summary_header(summary_file, header):
+    # An empty file (e.g. left by an interrupted first run) gets the full header too
+    if not os.path.exists(summary_file) or os.path.getsize(summary_file) == 0:
+        with open(summary_file, 'w', newline='') as f:
+            csv.writer(f).writerow(list(header) + SUMMARY_PROFILE_COLUMNS)
+        return
+
+    with open(summary_file, newline='') as f:
+        lines = f.readlines()
+    existing = next(csv.reader(lines[:1]), [])
+    missing = [column for column in SUMMARY_PROFILE_COLUMNS if column not in existing]
+    if missing:
+        # Older rows simply leave the new trailing columns empty
+        lines[0] = ','.join(existing + missing) + '\r\n'
+        tmp_file = summary_file + '.tmp'
+        with open(tmp_file, 'w', newline='') as f:
+            f.writelines(lines)
+        os.replace(tmp_file, summary_file)
@@ -0,0 +1,102 @@
+import os
+import re
+import time
+import argparse
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from epic_log import log
+
+# Parquet copy of the column dictionary, partitioned by letter:
+#
+#   {tables_dir}/parquet/letter={letter}/part-0.parquet
+#
+# Every string column is dictionary encoded (table_name, type, primary_key
+# and discontinued have a handful of distinct values per file) and pages are
+# zstd compressed. A partition is rewritten whenever its letter CSV is, so
+# the dataset always mirrors the CSVs.
+
+PARQUET_SUBDIR = 'parquet'
+LETTER_FILE = re.compile(r'^([A-Z]|SPECIAL)\.csv$')
+
+SCHEMA = pa.schema([
+    ('table_name', pa.string()),
+    ('column_name', pa.string()),
+    ('primary_key', pa.string()),
+    ('ordinal_position', pa.int32()),
+    ('type', pa.string()),
+    ('discontinued', pa.string()),
+    ('description', pa.string()),
+])
+
+# Descriptions contain newlines inside quoted fields
+_PARSE_OPTIONS = pa_csv.ParseOptions(newlines_in_values=True)
+_CONVERT_OPTIONS = pa_csv.ConvertOptions(column_types=SCHEMA, strings_can_be_null=False)
+
+def dataset_dir(tables_dir):
+    return os.path.join(tables_dir, PARQUET_SUBDIR)
+
+def partition_path(tables_dir, letter):
+    return os.path.join(dataset_dir(tables_dir), f"letter={letter}", 'part-0.parquet')
+
+# Function to read one letter CSV into an Arrow table with the dataset schema
+def read_letter_csv(letter_file):
+    return pa_csv.read_csv(letter_file, parse_options=_PARSE_OPTIONS, convert_options=_CONVERT_OPTIONS)
+
+# Function to write (or replace) one letter's partition from its CSV
+def write_letter_partition(tables_dir, letter, compression='zstd'):
+    letter_file = os.path.join(tables_dir, f"{letter}.csv")
+    path = partition_path(tables_dir, letter)
+    if not os.path.exists(letter_file):
+        if os.path.exists(path):
+            os.remove(path)
+        return 0
+
+    table = read_letter_csv(letter_file)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    pq.write_table(table, tmp_path, compression=compression, use_dictionary=True)
+    os.replace(tmp_path, path)
+    return table.num_rows
+
+# Function to bring the dataset up to date with the letter CSVs
+def export_dataset(tables_dir, force=False, compression='zstd'):
+    """Rewrite partitions whose CSV is newer than the Parquet file (all of them with force)"""
+    letters = sorted(match.group(1) for match in map(LETTER_FILE.match, os.listdir(tables_dir)) if match)
+    written = 0
+    for letter in letters:
+        path = partition_path(tables_dir, letter)
+        csv_mtime = os.path.getmtime(os.path.join(tables_dir, f"{letter}.csv"))
+        if force or not os.path.exists(path) or os.path.getmtime(path) < csv_mtime:
+            rows = write_letter_partition(tables_dir, letter, compression)
+            log(f"Wrote {rows} rows to {path}")
+            written += 1
+    log(f"Parquet dataset {dataset_dir(tables_dir)}: {written} of {len(letters)} partitions rewritten")
+    return written
+
+# Function to load the whole dictionary (or some letters) as an Arrow table
+def load_dictionary(tables_dir='epic_data_tables', letters=None, columns=None):
+    dataset = ds.dataset(dataset_dir(tables_dir), format='parquet', partitioning='hive')
+    row_filter = ds.field('letter').isin(letters) if letters else None
+    return dataset.to_table(columns=columns, filter=row_filter)
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Build the letter-partitioned Parquet copy of epic_data_tables")
+    parser.add_argument('--tables-dir', default='epic_data_tables')
+    parser.add_argument('--force', action='store_true', help="Rewrite every partition, not only stale ones")
+    parser.add_argument('--compression', default='zstd')
+    parser.add_argument('--load', action='store_true', help="Time a full load of the dataset afterwards")
+    args = parser.parse_args()
+
+    export_dataset(args.tables_dir, args.force, args.compression)
+
+    if args.load:
+        start = time.perf_counter()
+        table = load_dictionary(args.tables_dir)
+        log(f"Loaded {table.num_rows} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import io
+import os
+import re
+import csv
+import sqlite3
+import argparse
+
+from epic_log import log
+
+# Append-only primary key output.
+#
+# pk_{letter}.csv files are only ever appended to. Every (table_name,
+# column_name) already written is kept in {output_dir}/pk_key_index.db, so a
+# duplicate is rejected with one indexed lookup instead of re-reading the
+# letter file, and a resumed run costs time proportional to its new rows.
+#
+# Rows are written and fsync'd before their keys are committed to the index.
+# A crash between the two can leave a row in the file whose key is not
+# indexed yet, so a rerun may append it a second time; `compact` removes such
+# duplicates and rebuilds the index from the files.
+
+KEY_INDEX_DB = 'pk_key_index.db'
+LETTER_FILE = re.compile(r'^pk_([A-Z]|SPECIAL)\.csv$')
+PK_COLUMNS = ['table_name', 'column_name', 'is_primary_key', 'ordinal_position']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pk_keys (
+    table_name  TEXT NOT NULL,
+    column_name TEXT NOT NULL,
+    letter      TEXT NOT NULL,
+    PRIMARY KEY (table_name, column_name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS pk_keys_letter ON pk_keys (letter);
+
+CREATE TABLE IF NOT EXISTS pk_files (
+    letter   TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+class PrimaryKeyWriter:
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.index_path = os.path.join(output_dir, KEY_INDEX_DB)
+        new_index = not os.path.exists(self.index_path)
+        self.conn = sqlite3.connect(self.index_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        # Files written before the index existed are indexed once
+        if new_index:
+            self.rebuild_index()
+
+    def letter_file(self, letter):
+        return os.path.join(self.output_dir, f"pk_{letter}.csv")
+
+    def letters(self):
+        matches = (LETTER_FILE.match(name) for name in os.listdir(self.output_dir))
+        return sorted(match.group(1) for match in matches if match)
+
+    def _read_rows(self, letter):
+        with open(self.letter_file(letter), newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+
+    def _file_signature(self, letter):
+        try:
+            stat = os.stat(self.letter_file(letter))
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _record_signature(self, letter):
+        signature = self._file_signature(letter)
+        if signature is None:
+            self.conn.execute('DELETE FROM pk_files WHERE letter = ?', (letter,))
+        else:
+            self.conn.execute('INSERT OR REPLACE INTO pk_files VALUES (?, ?, ?)', (letter,) + signature)
+
+    def _index_letter(self, letter):
+        self.conn.execute('DELETE FROM pk_keys WHERE letter = ?', (letter,))
+        if self._file_signature(letter) is not None:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO pk_keys VALUES (?, ?, ?)',
+                ((row['table_name'], row['column_name'], letter) for row in self._read_rows(letter))
+            )
+        self._record_signature(letter)
+
+    def _ensure_fresh(self, letter):
+        """Re-index a letter whose file was rewritten or removed by something other than this writer"""
+        row = self.conn.execute('SELECT size, mtime_ns FROM pk_files WHERE letter = ?', (letter,)).fetchone()
+        if (tuple(row) if row else None) != self._file_signature(letter):
+            log(f"{self.letter_file(letter)} changed outside the key index, re-indexing it")
+            self._index_letter(letter)
+
+    def rebuild_index(self):
+        """Re-index every pk_{letter}.csv from scratch"""
+        with self.conn:
+            self.conn.execute('DELETE FROM pk_keys')
+            self.conn.execute('DELETE FROM pk_files')
+            for letter in self.letters():
+                self._index_letter(letter)
+        count = self.conn.execute('SELECT COUNT(*) FROM pk_keys').fetchone()[0]
+        log(f"Indexed {count} primary key columns in {self.index_path}")
+
+    def append(self, letter, rows):
+        """Append the rows whose (table_name, column_name) is not already written; returns how many were new"""
+        new_rows = []
+        with self.conn:
+            self._ensure_fresh(letter)
+            for row in rows:
+                cursor = self.conn.execute('INSERT OR IGNORE INTO pk_keys VALUES (?, ?, ?)',
+                                           (row['table_name'], row['column_name'], letter))
+                if cursor.rowcount:
+                    new_rows.append(row)
+            if new_rows:
+                # The file is synced inside the transaction, before the keys commit
+                letter_file = self.letter_file(letter)
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=PK_COLUMNS, extrasaction='ignore')
+                if not os.path.exists(letter_file):
+                    writer.writeheader()
+                writer.writerows(new_rows)
+                with open(letter_file, 'a', newline='', encoding='utf-8') as f:
+                    f.write(buffer.getvalue())
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._record_signature(letter)
+        return len(new_rows)
+
+    def compact(self, letters=None):
+        """Rewrite letter files without duplicate keys (the first row wins) and rebuild the index"""
+        for letter in letters or self.letters():
+            letter_file = self.letter_file(letter)
+            tmp_file = letter_file + '.tmp'
+            seen = set()
+            total = kept = 0
+            with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=PK_COLUMNS, extrasaction='ignore')
+                writer.writeheader()
+                for row in self._read_rows(letter):
+                    total += 1
+                    key = (row['table_name'], row['column_name'])
+                    if key not in seen:
+                        seen.add(key)
+                        writer.writerow(row)
+                        kept += 1
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, letter_file)
+            log(f"Compacted {letter_file}: {total} rows -> {kept}")
+        self.rebuild_index()
+
+    def close(self):
+        self.conn.close()
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the append-only primary key files and their key index")
+    parser.add_argument('command', choices=['compact', 'rebuild-index'])
+    parser.add_argument('--output-dir', default='epic_data_primary_keys')
+    parser.add_argument('--letter', action='append', help="Only compact this letter (repeatable)")
+    args = parser.parse_args()
+
+    writer = PrimaryKeyWriter(args.output_dir)
+    try:
+        if args.command == 'compact':
+            writer.compact(args.letter)
+        else:
+            writer.rebuild_index()
+    finally:
+        writer.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,157 +1,52 @@
 import os
-import time
 import csv
-import pandas as pd
-from playwright.sync_api import sync_playwright
-import re
 from datetime import datetime
-import sys
+import argparse
+import sqlite3
+
+from epic_crawl_state import get_crawl_state
+from epic_log import log
+from epic_letter_writer import LetterWriter
+from epic_rate_limiter import AimdRateLimiter
+from epic_table_parser import extract_page_tables, build_primary_key_rows
+from epic_snapshot_store import SnapshotStore, reparse_snapshot
+from epic_page_profile import LeanPageProfile, ensure_summary_header
 
 # Define the columns for our CSV
 columns = ['table_name', 'column_name', 'is_primary_key', 'ordinal_position']
 
-# Function to print with timestamp
-def log(message):
-    """Print a message with timestamp and immediately flush output"""
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    print(f"[{timestamp}] {message}")
-    sys.stdout.flush()
-
 # Function to extract primary key data from a table page
-def extract_primary_key_data(page, table_name, url):
+def extract_primary_key_data(page, table_name, url, snapshot_store=None, rate_limiter=None, page_profile=None):
     try:
         log(f"Processing table: {table_name}")
         
-        # Navigate with a timeout and wait until network is idle
-        page.goto(url, timeout=60000, wait_until='networkidle')
+        if page_profile:
+            # Load only the HTML document and wait for the tables, not the network
+            page_profile.load(page, url, rate_limiter)
+        else:
+            # Navigate with a timeout and wait until network is idle, paced by the rate limiter
+            if rate_limiter:
+                rate_limiter.goto(page, url, timeout=60000, wait_until='networkidle')
+            else:
+                page.goto(url, timeout=60000, wait_until='networkidle')
+            
+            # Wait for page content to load
+            page.wait_for_selector('table', timeout=10000)
         
-        # Wait for page content to load
-        page.wait_for_selector('table', timeout=10000)
+        # Keep the raw HTML so the page can be re-parsed later without re-crawling
+        if snapshot_store:
+            snapshot_store.put(table_name, url, page.content())
         
-        # Get all tables on the page
-        tables = page.query_selector_all('table')
+        # Pull every table's header and rows out of the page in one round-trip
+        tables = extract_page_tables(page)
         log(f"Found {len(tables)} tables on the page")
         
         if not tables:
             log("No tables found on the page. Skipping.")
             return []
         
-        primary_key_data = []
-        
-        # Extract primary key information
-        primary_keys = []
-        
-        # Look for a table that has column names and ordinal positions
-        # This is likely the primary key table
-        for table in tables:
-            header_row = table.query_selector('tr:first-child')
-            if not header_row:
-                continue
-                
-            header_cells = header_row.query_selector_all('td')
-            header_text = ' '.join([cell.inner_text().strip() for cell in header_cells])
-            
-            if 'Column Name' in header_text and 'Ordinal Position' in header_text:
-                log("Found primary key table")
-                
-                # Get all rows except the header
-                pk_rows = table.query_selector_all('tr:not(:first-child)')
-                
-                for row in pk_rows:
-                    cells = row.query_selector_all('td')
-                    if len(cells) >= 2:  # Assuming at least column name and ordinal position
-                        column_name = cells[0].inner_text().strip()
-                        ordinal_position = ''
-                        
-                        # Try to extract ordinal position if available
-                        position_col_index = -1
-                        for i, cell in enumerate(header_cells):
-                            if 'Ordinal Position' in cell.inner_text().strip():
-                                position_col_index = i
-                                break
-                                
-                        if position_col_index >= 0 and position_col_index < len(cells):
-                            ordinal_position = cells[position_col_index].inner_text().strip()
-                        
-                        primary_key_data.append({
-                            'table_name': table_name,
-                            'column_name': column_name,
-                            'is_primary_key': 'Y',
-                            'ordinal_position': ordinal_position
-                        })
-                        
-                        primary_keys.append(column_name)
-                
-                log(f"Primary keys: {primary_keys}")
-                break
-        
-        # If no specific primary key table was found, try to extract from column information
-        if not primary_key_data:
-            log("No dedicated primary key table found. Checking column information.")
-            
-            # Find column information table - look for tables with numeric first columns
-            column_table = None
-            for table in tables:
-                rows = table.query_selector_all('tr:not(:first-child)')
-                if not rows:
-                    continue
-                    
-                first_cell = rows[0].query_selector('td:first-child')
-                if first_cell and first_cell.inner_text().strip().isdigit():
-                    log("Found table with column information")
-                    column_table = table
-                    break
-            
-            if column_table:
-                header_row = column_table.query_selector('tr:first-child')
-                header_cells = header_row.query_selector_all('td')
-                header_texts = [cell.inner_text().strip() for cell in header_cells]
-                
-                # Look for a PK indicator in the header
-                pk_col_index = -1
-                for i, text in enumerate(header_texts):
-                    if 'Primary Key' in text or 'PK' in text:
-                        pk_col_index = i
-                        break
-                
-                # Process column information to find primary keys
-                column_rows = column_table.query_selector_all('tr:not(:first-child)')
-                
-                for row in column_rows:
-                    cells = row.query_selector_all('td')
-                    
-                    if len(cells) >= 4 and cells[0].inner_text().strip().isdigit():
-                        position = cells[0].inner_text().strip()
-                        column_name = cells[1].inner_text().strip()
-                        
-                        # Determine if this is a primary key
-                        is_primary_key = 'N'
-                        
-                        # Method 1: Check for a primary key column
-                        if pk_col_index >= 0 and pk_col_index < len(cells):
-                            pk_text = cells[pk_col_index].inner_text().strip().upper()
-                            if pk_text in ['Y', 'YES', 'TRUE', '1', 'PK']:
-                                is_primary_key = 'Y'
-                        
-                        # Method 2: Check for PK indicator in the column name or description
-                        if is_primary_key == 'N':
-                            # Check in column name (common pattern is column name ending with _ID or containing PK)
-                            if column_name.endswith('_ID') or 'KEY' in column_name.upper() or 'PK' in column_name.upper():
-                                # This is a heuristic, might give false positives
-                                is_primary_key = 'Y'  
-                            
-                            # Check in the row text for PK indicators
-                            row_text = row.inner_text().upper()
-                            if 'PRIMARY KEY' in row_text or 'PK:' in row_text or ' PK ' in row_text:
-                                is_primary_key = 'Y'
-                        
-                        if is_primary_key == 'Y':
-                            primary_key_data.append({
-                                'table_name': table_name,
-                                'column_name': column_name,
-                                'is_primary_key': is_primary_key,
-                                'ordinal_position': position
-                            })
+        # Match the primary key table, or fall back to column information, in Python
+        primary_key_data = build_primary_key_rows(tables, table_name)
         
         log(f"Successfully extracted {len(primary_key_data)} primary key columns for table {table_name}")
         return primary_key_data
@@ -160,49 +55,44 @@ def extract_primary_key_data(page, table_name, url):
         log(f"Error processing table {table_name}: {e}")
         return []
 
+# Function to open the crawl state for an output directory, importing the old CSV progress on first use
+def crawl_state(output_dir):
+    return get_crawl_state(output_dir, 'pk_progress_state.csv', 'pk_processing_summary.csv')
+
 # Function to load progress
 def load_progress(output_dir):
-    progress_file = os.path.join(output_dir, 'pk_progress_state.csv')
-    if os.path.exists(progress_file):
-        try:
-            df = pd.read_csv(progress_file)
-            if 'letter' in df.columns:
-                processed_letters = set(df['letter'].dropna().tolist())
-                current_letter = None
-                if 'current_letter' in df.columns and not df['current_letter'].isna().all():
-                    current_letter = df['current_letter'].iloc[0]
-                log(f"Loaded progress: processed letters: {sorted(processed_letters)}, current: {current_letter}")
-                return processed_letters, current_letter
-        except Exception as e:
-            log(f"Error loading progress: {e}")
+    try:
+        processed_letters, current_letter = crawl_state(output_dir).load_progress()
+        if processed_letters or current_letter:
+            log(f"Loaded progress: processed letters: {sorted(processed_letters)}, current: {current_letter}")
+        return processed_letters, current_letter
+    except sqlite3.Error as e:
+        log(f"Error loading progress: {e}")
     return set(), None
 
 # Function to save progress
 def save_progress(output_dir, processed_letters, current_letter=None):
-    progress_file = os.path.join(output_dir, 'pk_progress_state.csv')
     try:
-        # Create data for the DataFrame
-        data = {'letter': list(processed_letters)}
-        if len(processed_letters) == 0:
-            data['letter'] = [None]
-        
-        data['current_letter'] = [current_letter] + [None] * (len(processed_letters) - 1 if len(processed_letters) > 0 else 0)
-            
-        df = pd.DataFrame(data)
-        df.to_csv(progress_file, index=False)
+        crawl_state(output_dir).save_progress(processed_letters, current_letter)
         log(f"Saved progress - processed: {sorted(processed_letters)}, current: {current_letter}")
-    except Exception as e:
+    except sqlite3.Error as e:
         log(f"Error saving progress: {e}")
 
 # Process tables for a specific letter
-def process_letter_tables(page, letter, letter_tables, output_dir, batch_size=5):
+def process_letter_tables(page, letter, letter_tables, output_dir, batch_size=5, snapshot_store=None, rate_limiter=None, page_profile=None):
     log(f"\n{'='*70}")
     log(f"PROCESSING LETTER '{letter}' - {len(letter_tables)} tables")
     log(f"{'='*70}")
     
     total_success = 0
     total_error = 0
-    letter_data = []
+    
+    # Rows are streamed to pk_{letter}.csv.partial table by table; a rerun skips tables already in it
+    writer = LetterWriter(os.path.join(output_dir, f"pk_{letter}.csv"), columns)
+    written_tables = writer.open()
+    if written_tables:
+        letter_tables = [(name, url) for name, url in letter_tables if name not in written_tables]
+        log(f"Skipping {len(written_tables)} tables already written for letter '{letter}'")
     
     # Process in batches
     total_batches = (len(letter_tables) + batch_size - 1) // batch_size
@@ -219,10 +109,10 @@ def process_letter_tables(page, letter, letter_tables, output_dir, batch_size=5)
                 table_start_time = datetime.now()
                 log(f"[{i+1}/{len(batch)}] Processing: {table_name}")
                 
-                pk_data = extract_primary_key_data(page, table_name, url)
+                pk_data = extract_primary_key_data(page, table_name, url, snapshot_store, rate_limiter=rate_limiter, page_profile=page_profile)
                 
                 if pk_data:
-                    letter_data.extend(pk_data)
+                    writer.append(table_name, pk_data)
                     total_success += 1
                     log(f"  ✓ Successfully extracted {len(pk_data)} primary key columns")
                 else:
@@ -231,16 +121,19 @@ def process_letter_tables(page, letter, letter_tables, output_dir, batch_size=5)
                 
                 # Update summary file
                 with open(os.path.join(output_dir, 'pk_processing_summary.csv'), 'a', newline='') as f:
-                    writer = csv.writer(f)
+                    summary_writer = csv.writer(f)
                     processing_time = (datetime.now() - table_start_time).total_seconds()
-                    writer.writerow([
+                    profile_values = page_profile.summary_values() if page_profile else ['', '']
+                    summary_writer.writerow([
                         letter, 
                         table_name, 
                         len(pk_data) if pk_data else 0, 
                         "Success" if pk_data else "No Data", 
                         "", 
                         processing_time
-                    ])
+                    ] + profile_values)
+                crawl_state(output_dir).record_table(letter, table_name, "Success" if pk_data else "No Data",
+                                                     len(pk_data) if pk_data else 0, "", processing_time, url)
                 
             except Exception as e:
                 total_error += 1
@@ -248,37 +141,53 @@ def process_letter_tables(page, letter, letter_tables, output_dir, batch_size=5)
                 
                 # Update summary file
                 with open(os.path.join(output_dir, 'pk_processing_summary.csv'), 'a', newline='') as f:
-                    writer = csv.writer(f)
+                    summary_writer = csv.writer(f)
                     processing_time = (datetime.now() - table_start_time).total_seconds() if 'table_start_time' in locals() else 0
-                    writer.writerow([letter, table_name, 0, "Error", str(e), processing_time])
-            
-            # Small delay between tables
-            time.sleep(1)
+                    summary_writer.writerow([letter, table_name, 0, "Error", str(e), processing_time, '', ''])
+                crawl_state(output_dir).record_table(letter, table_name, "Error", 0, str(e), processing_time, url)
             
             # Progress update
             total_processed = batch_num * batch_size + i + 1
             progress_pct = (total_processed / len(letter_tables)) * 100 if letter_tables else 0
             log(f"  Letter {letter} Progress: {progress_pct:.1f}% ({total_processed}/{len(letter_tables)})")
-        
-        # Pause between batches
-        if batch_num < total_batches - 1:
-            log(f"Completed batch {batch_num+1}/{total_batches}. Taking a short break...")
-            time.sleep(3)
     
-    # Save the data for this letter
-    if letter_data:
-        letter_file = os.path.join(output_dir, f"pk_{letter}.csv")
-        df = pd.DataFrame(letter_data)
-        df.to_csv(letter_file, index=False)
-        log(f"Saved {len(letter_data)} primary key columns to {letter_file}")
+    # Move the finished letter file into place
+    total_rows = writer.finalize()
+    if total_rows:
+        log(f"Saved {total_rows} primary key columns to {writer.letter_file}")
     else:
         log(f"No primary key data extracted for letter '{letter}'. CSV file not created.")
     
     log(f"\nLetter '{letter}' processing complete: {total_success} successful, {total_error} failed")
     return total_success, total_error
 
+# Function to rebuild the letter files from stored HTML with no network I/O
+def reparse_from_snapshot(snapshot_store, crawl_date, output_dir, alphabet):
+    import pandas as pd
+    crawl_date = snapshot_store.resolve_crawl_date(crawl_date)
+    log(f"Re-parsing snapshot {crawl_date} from {snapshot_store.root}")
+    start_time = datetime.now()
+    
+    letter_rows = reparse_snapshot(snapshot_store, crawl_date, build_primary_key_rows, alphabet)
+    for letter, letter_data in letter_rows.items():
+        if letter_data:
+            letter_file = os.path.join(output_dir, f"pk_{letter}.csv")
+            pd.DataFrame(letter_data, columns=columns).to_csv(letter_file, index=False)
+            log(f"Saved {len(letter_data)} primary key columns to {letter_file}")
+    
+    log(f"Re-parsed snapshot {crawl_date} in {(datetime.now() - start_time).total_seconds():.1f}s")
+
 # Main function
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--from-snapshot', nargs='?', const='latest', metavar='CRAWL_DATE',
+                        help="Re-parse stored HTML (default: latest crawl) instead of crawling")
+    parser.add_argument('--snapshot-dir', default='epic_html_snapshots')
+    parser.add_argument('--no-snapshot', action='store_true', help="Do not store fetched pages")
+    parser.add_argument('--full-page-load', action='store_true',
+                        help="Load every page resource and wait for network idle instead of the lean profile")
+    args = parser.parse_args()
+    
     print("\n" + "="*70)
     print("EPIC EHI TABLES PRIMARY KEY EXTRACTION - ALPHABETICAL")
     print("Processing all alphabet letters automatically")
@@ -291,9 +200,17 @@ def main():
     # Define alphabet
     alphabet = list('ABCDEFGHIJKLMNOPQRSTUVWXYZ') + ['SPECIAL']
     
+    # Re-parse stored pages instead of crawling
+    if args.from_snapshot:
+        reparse_from_snapshot(SnapshotStore(args.snapshot_dir), args.from_snapshot, output_dir, alphabet)
+        return
+    
+    snapshot_store = None if args.no_snapshot else SnapshotStore(args.snapshot_dir)
+    
     # Load progress
     processed_letters, current_letter = load_progress(output_dir)
     
+    from playwright.sync_api import sync_playwright
     with sync_playwright() as p:
         try:
             log("Launching browser...")
@@ -301,6 +218,14 @@ def main():
             context = browser.new_context()
             page = context.new_page()
             
+            # Paces page loads and backs off when the server slows down
+            rate_limiter = AimdRateLimiter()
+            
+            # Block everything but the HTML document on table pages
+            page_profile = None if args.full_page_load else LeanPageProfile()
+            if page_profile:
+                page_profile.apply(page)
+            
             # Navigate to the index page
             index_url = "https://open.epic.com/EHITables/GetTable/_index.htm"
             log(f"Loading index page: {index_url}")
@@ -377,10 +302,7 @@ def main():
             
             # Create/update summary file header if doesn't exist
             summary_file = os.path.join(output_dir, 'pk_processing_summary.csv')
-            if not os.path.exists(summary_file):
-                with open(summary_file, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(['Letter', 'Table_Name', 'PK_Column_Count', 'Status', 'Error', 'Processing_Time'])
+            ensure_summary_header(summary_file, ['Letter', 'Table_Name', 'PK_Column_Count', 'Status', 'Error', 'Processing_Time'])
             
             # Determine start letter
             start_index = 0
@@ -420,22 +342,16 @@ def main():
                     continue
                 
                 # Process tables for this letter
-                process_letter_tables(page, letter, letter_tables, output_dir)
+                process_letter_tables(page, letter, letter_tables, output_dir, snapshot_store=snapshot_store, rate_limiter=rate_limiter, page_profile=page_profile)
                 
                 # Mark letter as processed
                 processed_letters.add(letter)
                 save_progress(output_dir, processed_letters)
-                
-                # Take a break between letters
-                if i < len(alphabet) - 1:
-                    next_letter = alphabet[i+1]
-                    if next_letter not in processed_letters:
-                        log(f"Taking a break before starting letter '{next_letter}'...")
-                        time.sleep(10)
             
             # Final summary
             log("\n" + "="*70)
             log("PROCESSING COMPLETE")
+            rate_limiter.log_stats()
             log(f"Processed letters: {sorted(processed_letters)}")
             letter_files = [f for f in os.listdir(output_dir) if f.endswith('.csv') and f != 'pk_processing_summary.csv']
             log(f"Letter files created: {len(letter_files)}")
@@ -0,0 +1,109 @@
+import time
+import asyncio
+import threading
+
+from epic_log import log
+
+# Additive-increase / multiplicative-decrease request pacing.
+#
+# Every request waits for a slot spaced 1/rate seconds apart. A healthy
+# response nudges the rate up by `increase` requests/second; a timeout,
+# error, 429/5xx or a response slower than `latency_target` cuts the rate
+# by `decrease`. Cuts are limited to one per `cooldown` seconds so a burst
+# of concurrent failures from the same slowdown only backs off once.
+
+class AimdRateLimiter:
+    def __init__(self, initial_rate=2.0, min_rate=0.2, max_rate=50.0, increase=0.1,
+                 decrease=0.5, latency_target=10.0, cooldown=5.0, log_interval=30.0):
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.log_interval = log_interval
+
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+        self.last_cut = 0.0
+        self.started = time.monotonic()
+        self.last_log = self.started
+        self.completed = 0
+        self.failed = 0
+        self.total_latency = 0.0
+
+    def _reserve(self):
+        """Reserve the next request slot and return how long to wait for it"""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + 1.0 / self.rate
+            return slot - now
+
+    def acquire(self):
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def record(self, latency, ok=True, status=None):
+        """Feed back the outcome of one request"""
+        overloaded = not ok or status == 429 or (status is not None and status >= 500)
+        with self.lock:
+            now = time.monotonic()
+            self.completed += 1
+            self.total_latency += latency
+            if overloaded:
+                self.failed += 1
+
+            if overloaded or latency > self.latency_target:
+                if now - self.last_cut >= self.cooldown:
+                    self.rate = max(self.min_rate, self.rate * self.decrease)
+                    self.last_cut = now
+                    log(f"Rate limiter: backing off to {self.rate:.2f} req/s "
+                        f"(status {status}, latency {latency:.1f}s)")
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+            if now - self.last_log >= self.log_interval:
+                self.last_log = now
+                self._log_stats(now)
+
+    def _log_stats(self, now):
+        elapsed = max(now - self.started, 1e-9)
+        mean_latency = self.total_latency / self.completed if self.completed else 0.0
+        log(f"Rate limiter: target {self.rate:.2f} req/s, effective {self.completed / elapsed:.2f} req/s, "
+            f"{self.completed} requests, {self.failed} failed, mean latency {mean_latency:.2f}s")
+
+    def log_stats(self):
+        with self.lock:
+            self._log_stats(time.monotonic())
+
+    def goto(self, page, url, **kwargs):
+        """page.goto paced and measured by the limiter"""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            response = page.goto(url, **kwargs)
+        except Exception:
+            self.record(time.monotonic() - start, ok=False)
+            raise
+        self.record(time.monotonic() - start, status=response.status if response else None)
+        return response
+
+    async def goto_async(self, page, url, **kwargs):
+        """Async page.goto paced and measured by the limiter"""
+        await self.acquire_async()
+        start = time.monotonic()
+        try:
+            response = await page.goto(url, **kwargs)
+        except Exception:
+            self.record(time.monotonic() - start, ok=False)
+            raise
+        self.record(time.monotonic() - start, status=response.status if response else None)
+        return response
@@ -0,0 +1,171 @@
+import os
+import queue
+import argparse
+import multiprocessing
+from datetime import datetime
+
+from epic_log import log
+from epic_data_scraper_alphabetical import load_progress, save_progress, group_tables_by_letter
+from epic_crawl_engine import (
+    ALPHABET,
+    BrowserPageSource,
+    crawl_table,
+    append_table,
+    ensure_summaries,
+    finalize_letter_writers,
+    open_letter_writers,
+    record_table,
+)
+from epic_rate_limiter import AimdRateLimiter
+from epic_snapshot_store import SnapshotStore
+
+# Multi-process crawl balanced by table rather than by letter.
+#
+# The coordinator loads the index and puts every pending table on one shared
+# queue. Each worker process runs its own browser and pulls tables until it
+# gets a stop marker. Results come back to the coordinator, which is the only
+# writer: it appends the summaries and streams rows into the letter files in
+# index order as results arrive, and finalizes a letter as soon as its last
+# table is in, so the output layout and progress are the same as
+# epic_crawl_engine.py.
+
+# Seconds to wait for a result before checking that the workers are still alive
+RESULT_POLL_SECONDS = 30
+
+# Worker process: crawl tables from the task queue until a None marker arrives
+def crawl_worker(task_queue, result_queue, headless, snapshot_dir, max_rate, lean):
+    snapshot_store = SnapshotStore(snapshot_dir) if snapshot_dir else None
+    source = BrowserPageSource(headless=headless, snapshot_store=snapshot_store,
+                               rate_limiter=AimdRateLimiter(max_rate=max_rate), lean=lean)
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            letter, position, table_name, url = task
+            result_queue.put((letter, position, table_name, url, crawl_table(source, table_name, url)))
+    finally:
+        source.close()
+
+# Function to collect results, streaming each table into its letter files in index order
+def collect_results(result_queue, workers, letter_tasks, writers, processed_letters, tables_dir, pk_dir, state_dir):
+    """letter_tasks maps each pending letter to its (table_name, url) tasks in index order"""
+    outstanding = {letter: len(tasks) for letter, tasks in letter_tasks.items()}
+    remaining = sum(outstanding.values())
+    total_success = 0
+
+    while remaining:
+        try:
+            letter, position, table_name, url, result = result_queue.get(timeout=RESULT_POLL_SECONDS)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                log(f"All workers exited with {remaining} tables outstanding; unfinished letters stay pending")
+                break
+            continue
+
+        remaining -= 1
+        column_writer, pk_writer = writers[letter]
+        append_table(column_writer, pk_writer, table_name, result[0], result[1], position)
+        record_table(letter, table_name, url, result, tables_dir, pk_dir, state_dir)
+        if result[0]:
+            total_success += 1
+        else:
+            log(f"  ! {table_name}: {result[2]} {result[3]}")
+
+        outstanding[letter] -= 1
+        if not outstanding[letter]:
+            finalize_letter_writers(column_writer, pk_writer)
+            processed_letters.add(letter)
+            save_progress(state_dir, processed_letters)
+
+    return total_success, remaining
+
+# Function to run a sharded crawl of every pending letter
+def crawl(processes, headless, tables_dir, pk_dir, state_dir, snapshot_dir=None, max_rate=50.0, lean=True):
+    for directory in (tables_dir, pk_dir, state_dir):
+        os.makedirs(directory, exist_ok=True)
+    ensure_summaries(tables_dir, pk_dir)
+
+    processed_letters, _ = load_progress(state_dir)
+    index_source = BrowserPageSource(headless=headless)
+    try:
+        letter_groups = group_tables_by_letter(index_source.list_tables(), ALPHABET)
+    finally:
+        index_source.close()
+
+    pending = [letter for letter in ALPHABET if letter not in processed_letters and letter_groups.get(letter)]
+
+    # Tables already streamed to a letter's partial files by an interrupted run are not queued again
+    writers = {}
+    letter_tasks = {}
+    for letter in pending:
+        column_writer, pk_writer, written_tables = open_letter_writers(letter, tables_dir, pk_dir)
+        writers[letter] = (column_writer, pk_writer)
+        letter_tasks[letter] = [(name, url) for name, url in letter_groups[letter] if name not in written_tables]
+        if not letter_tasks[letter]:
+            finalize_letter_writers(column_writer, pk_writer)
+            processed_letters.add(letter)
+            save_progress(state_dir, processed_letters)
+            del letter_tasks[letter]
+    total = sum(len(tasks) for tasks in letter_tasks.values())
+    log(f"Pending letters: {list(letter_tasks)} - {total} tables over {processes} processes")
+
+    # Spawn, not fork: each worker starts its own Playwright driver from scratch
+    ctx = multiprocessing.get_context('spawn')
+    task_queue = ctx.Queue()
+    result_queue = ctx.Queue()
+    for letter, tasks in letter_tasks.items():
+        for position, (table_name, url) in enumerate(tasks):
+            task_queue.put((letter, position, table_name, url))
+    for _ in range(processes):
+        task_queue.put(None)
+
+    # The request rate cap is shared out between the workers
+    workers = [
+        ctx.Process(target=crawl_worker,
+                    args=(task_queue, result_queue, headless, snapshot_dir, max_rate / processes, lean))
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+
+    start_time = datetime.now()
+    try:
+        total_success, remaining = collect_results(
+            result_queue, workers, letter_tasks, writers, processed_letters, tables_dir, pk_dir, state_dir
+        )
+    finally:
+        for worker in workers:
+            worker.join(timeout=60)
+            if worker.is_alive():
+                worker.terminate()
+
+    elapsed = (datetime.now() - start_time).total_seconds()
+    log(f"Crawl complete in {elapsed:.1f}s: {total_success} tables successful, "
+        f"{total - total_success - remaining} without data, {remaining} not crawled")
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process crawl of the Epic EHI tables over a shared table queue")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help="Worker processes, one browser each")
+    parser.add_argument('--headed', action='store_true', help="Show the browser windows")
+    parser.add_argument('--max-rate', type=float, default=50.0, help="Upper bound on page requests/second across all workers")
+    parser.add_argument('--tables-dir', default='epic_data_tables')
+    parser.add_argument('--pk-dir', default='epic_data_primary_keys')
+    parser.add_argument('--state-dir', default='epic_crawl_state')
+    parser.add_argument('--snapshot-dir', default='epic_html_snapshots')
+    parser.add_argument('--no-snapshot', action='store_true', help="Do not store fetched pages")
+    parser.add_argument('--full-page-load', action='store_true',
+                        help="Load every page resource and wait for network idle instead of the lean profile")
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print(f"EPIC EHI TABLES SHARDED EXTRACTION - {args.processes} PROCESSES")
+    print("="*70 + "\n")
+
+    crawl(args.processes, not args.headed, args.tables_dir, args.pk_dir, args.state_dir,
+          snapshot_dir=None if args.no_snapshot else args.snapshot_dir,
+          max_rate=args.max_rate, lean=not args.full_page_load)
+
+if __name__ == "__main__":
+    main()
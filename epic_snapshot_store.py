@@ -0,0 +1,112 @@
+import os
+import csv
+import gzip
+import hashlib
+import threading
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+# Content-addressed store of raw table page HTML.
+#
+#   {root}/objects/{sha[:2]}/{sha}.html.gz   - gzip'd page HTML, one file per unique page
+#   {root}/manifests/{crawl_date}.csv         - table_name,url,sha256,size,fetched_at
+#
+# Pages that did not change between crawls share one object, so keeping a
+# snapshot per crawl date costs little more than the manifest.
+
+MANIFEST_COLUMNS = ['table_name', 'url', 'sha256', 'size', 'fetched_at']
+
+class SnapshotStore:
+    def __init__(self, root='epic_html_snapshots', crawl_date=None):
+        self.root = root
+        self.crawl_date = crawl_date or datetime.now().strftime('%Y-%m-%d')
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'manifests'), exist_ok=True)
+
+    def object_path(self, sha):
+        return os.path.join(self.root, 'objects', sha[:2], f"{sha}.html.gz")
+
+    def manifest_path(self, crawl_date):
+        return os.path.join(self.root, 'manifests', f"{crawl_date}.csv")
+
+    def put(self, table_name, url, html):
+        """Store a fetched page under the current crawl date and return its content hash"""
+        data = html.encode('utf-8')
+        sha = hashlib.sha256(data).hexdigest()
+        path = self.object_path(sha)
+
+        # Objects are immutable - write once, atomically
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        with self.lock:
+            manifest = self.manifest_path(self.crawl_date)
+            new_file = not os.path.exists(manifest)
+            with open(manifest, 'a', newline='') as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(MANIFEST_COLUMNS)
+                writer.writerow([table_name, url, sha, len(data), datetime.now().isoformat(timespec='seconds')])
+        return sha
+
+    def get(self, sha):
+        with gzip.open(self.object_path(sha), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def crawl_dates(self):
+        manifests = os.listdir(os.path.join(self.root, 'manifests'))
+        return sorted(name[:-4] for name in manifests if name.endswith('.csv'))
+
+    def resolve_crawl_date(self, crawl_date=None):
+        """Return crawl_date, or the most recent crawl date when crawl_date is None or 'latest'"""
+        if crawl_date and crawl_date != 'latest':
+            return crawl_date
+        dates = self.crawl_dates()
+        if not dates:
+            raise FileNotFoundError(f"No snapshots found in {self.root}")
+        return dates[-1]
+
+    def load_manifest(self, crawl_date=None):
+        """Return {table_name: manifest row} for a crawl date; the last fetch of a table wins"""
+        entries = {}
+        with open(self.manifest_path(self.resolve_crawl_date(crawl_date)), newline='') as f:
+            for row in csv.DictReader(f):
+                entries[row['table_name']] = row
+        return entries
+
+# Function to parse one stored page in a worker process
+def _parse_snapshot(args):
+    root, sha, table_name, build_rows = args
+    from epic_table_parser import parse_html_tables
+    with gzip.open(os.path.join(root, 'objects', sha[:2], f"{sha}.html.gz"), 'rb') as f:
+        html = f.read().decode('utf-8')
+    return build_rows(parse_html_tables(html), table_name)
+
+# Function to re-run extraction over a stored crawl with no network I/O
+def reparse_snapshot(store, crawl_date, build_rows, alphabet, workers=None):
+    """Return {letter: rows} built from every table page stored for crawl_date
+
+    build_rows is one of the epic_table_parser row builders and must be a
+    module-level function so it can be sent to the worker processes.
+    """
+    from epic_data_scraper_alphabetical import group_tables_by_letter
+
+    manifest = store.load_manifest(crawl_date)
+    # Concurrent crawls store pages in completion order; the index lists tables alphabetically
+    all_tables = sorted((name, entry['url']) for name, entry in manifest.items())
+    letter_groups = group_tables_by_letter(all_tables, alphabet)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Submit every letter up front so workers stay busy across letters
+        pending = {}
+        for letter in alphabet:
+            tables = letter_groups.get(letter, [])
+            if tables:
+                jobs = [(store.root, manifest[name]['sha256'], name, build_rows) for name, _ in tables]
+                pending[letter] = executor.map(_parse_snapshot, jobs, chunksize=32)
+        return {letter: [row for rows in results for row in rows] for letter, results in pending.items()}
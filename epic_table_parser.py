@@ -0,0 +1,245 @@
+import re
+
+# Parsed pages are represented as plain Python structures so the same
+# column / primary key logic can run on HTML fetched over HTTP and on
+# tables pulled out of a live browser page:
+#
+#   [{'header': [cell text, ...],
+#     'rows': [{'cells': [cell text, ...], 'text': row text}, ...]}, ...]
+#
+# 'header' is the first row of the table and 'rows' are all the other rows,
+# mirroring the 'tr:first-child' / 'tr:not(:first-child)' selectors used
+# by the Playwright extractors.
+
+_SPACES = re.compile(r'[ \t\r\f\v]+')
+
+# Function to approximate Playwright's inner_text() for an lxml element
+def element_text(element):
+    parts = []
+    for node in element.iter():
+        if node.tag == 'br':
+            parts.append('\n')
+        if node.text and node.tag not in ('script', 'style'):
+            parts.append(node.text)
+        if node is not element and node.tail:
+            parts.append(node.tail)
+    text = ''.join(parts)
+    lines = [_SPACES.sub(' ', line).strip() for line in text.split('\n')]
+    return '\n'.join(line for line in lines if line)
+
+# Function to check whether a row is the first element child of its parent
+def _is_first_child(row):
+    previous = row.getprevious()
+    while previous is not None:
+        if isinstance(previous.tag, str):
+            return False
+        previous = previous.getprevious()
+    return True
+
+# Function to parse all tables on a page into header / row text
+def parse_html_tables(html):
+    import lxml.html
+    document = lxml.html.fromstring(html)
+    tables = []
+    for table in document.iter('table'):
+        header = []
+        rows = []
+        for row in table.iter('tr'):
+            if _is_first_child(row):
+                if not header:
+                    header = [element_text(cell) for cell in row.iter('td')]
+                continue
+            cells = [element_text(cell) for cell in row.iter('td')]
+            # A row's inner_text() separates its cells with tabs
+            rows.append({'cells': cells, 'text': '\t'.join(cells).strip()})
+        tables.append({'header': header, 'rows': rows})
+    return tables
+
+# Script that pulls every table's header and rows out of the page in a
+# single round-trip, using the same selectors as the per-cell extractors
+PAGE_TABLES_SCRIPT = """
+() => Array.from(document.querySelectorAll('table')).map(table => {
+    const cellTexts = row => Array.from(row.querySelectorAll('td')).map(cell => cell.innerText);
+    const headerRow = table.querySelector('tr:first-child');
+    return {
+        header: headerRow ? cellTexts(headerRow) : [],
+        rows: Array.from(table.querySelectorAll('tr:not(:first-child)')).map(row => ({
+            cells: cellTexts(row),
+            text: row.innerText,
+        })),
+    };
+})
+"""
+
+# Function to strip the raw innerText values returned by PAGE_TABLES_SCRIPT
+def _strip_page_tables(raw_tables):
+    return [{
+        'header': [text.strip() for text in table['header']],
+        'rows': [{'cells': [text.strip() for text in row['cells']], 'text': row['text'].strip()}
+                 for row in table['rows']],
+    } for table in raw_tables]
+
+# Function to read all tables from a loaded Playwright page in one evaluate call
+def extract_page_tables(page):
+    return _strip_page_tables(page.evaluate(PAGE_TABLES_SCRIPT))
+
+# Function to read all tables from a loaded async Playwright page in one evaluate call
+async def extract_page_tables_async(page):
+    return _strip_page_tables(await page.evaluate(PAGE_TABLES_SCRIPT))
+
+# Function to find the column information table - the first table whose
+# first data row starts with a number
+def find_column_table(tables):
+    for table in tables:
+        rows = table['rows']
+        if not rows:
+            continue
+        if rows[0]['cells'] and rows[0]['cells'][0].isdigit():
+            return table
+    return None
+
+# Function to find the primary key table - header has column names and ordinal positions
+def find_primary_key_table(tables):
+    for table in tables:
+        header_text = ' '.join(table['header'])
+        if 'Column Name' in header_text and 'Ordinal Position' in header_text:
+            return table
+    return None
+
+# Function to build the column rows written to epic_data_tables/{letter}.csv
+def build_column_rows(tables, table_name):
+    """Same rows as extract_table_data, built from parsed tables"""
+    primary_keys = []
+    pk_table = find_primary_key_table(tables)
+    if pk_table:
+        for row in pk_table['rows']:
+            if len(row['cells']) >= 1:
+                primary_keys.append(row['cells'][0])
+
+    column_table = find_column_table(tables)
+    if not column_table:
+        return []
+
+    table_data = []
+    descriptions = {}
+    current_column = None
+
+    for row in column_table['rows']:
+        cells = row['cells']
+
+        # If first cell is a number, it's a column definition row
+        if len(cells) >= 4 and cells[0].isdigit():
+            column_name = cells[1]
+            description = cells[4] if len(cells) > 4 else ""
+
+            current_column = column_name
+            descriptions[current_column] = description
+
+            table_data.append({
+                'table_name': table_name,
+                'column_name': column_name,
+                'primary_key': 'Y' if column_name in primary_keys else 'N',
+                'ordinal_position': cells[0],
+                'type': cells[2],
+                'discontinued': cells[3],
+                'description': description
+            })
+
+        # If first cell is not a number, it might be a continuation of the description
+        elif current_column and len(cells) > 0:
+            extra_text = row['text']
+            if extra_text:
+                if descriptions[current_column]:
+                    descriptions[current_column] += " " + extra_text
+                else:
+                    descriptions[current_column] = extra_text
+
+    # Update descriptions in the table data
+    for row in table_data:
+        row['description'] = descriptions.get(row['column_name'], '')
+
+    return table_data
+
+# Function to collapse a description that was merged with its own continuation row
+def collapse_repeated_description(text):
+    """Return the first copy of a description stored twice, otherwise the text unchanged
+
+    The description cell is followed by a continuation row holding the same
+    text with its line breaks flattened, and build_column_rows appends one to
+    the other, so the halves match once whitespace is normalized.
+    """
+    flat = ' '.join(text.split())
+    half = len(flat) // 2
+    if len(flat) % 2 == 0 or flat[half] != ' ' or flat[:half] != flat[half + 1:]:
+        return text
+    # Keep the copy with the line breaks when the second half is the flattened one
+    tail = ' ' + flat[half + 1:]
+    if text.endswith(tail) and ' '.join(text[:-len(tail)].split()) == flat[:half]:
+        return text[:-len(tail)].rstrip()
+    return flat[:half]
+
+# Function to build the rows written to epic_data_primary_keys/pk_{letter}.csv
+def build_primary_key_rows(tables, table_name):
+    """Same rows as extract_primary_key_data, built from parsed tables"""
+    primary_key_data = []
+
+    pk_table = find_primary_key_table(tables)
+    if pk_table:
+        position_col_index = -1
+        for i, text in enumerate(pk_table['header']):
+            if 'Ordinal Position' in text:
+                position_col_index = i
+                break
+
+        for row in pk_table['rows']:
+            cells = row['cells']
+            if len(cells) >= 2:  # Assuming at least column name and ordinal position
+                ordinal_position = ''
+                if 0 <= position_col_index < len(cells):
+                    ordinal_position = cells[position_col_index]
+                primary_key_data.append({
+                    'table_name': table_name,
+                    'column_name': cells[0],
+                    'is_primary_key': 'Y',
+                    'ordinal_position': ordinal_position
+                })
+
+    # If no specific primary key table was found, try to extract from column information
+    if not primary_key_data:
+        column_table = find_column_table(tables)
+        if column_table:
+            # Look for a PK indicator in the header
+            pk_col_index = -1
+            for i, text in enumerate(column_table['header']):
+                if 'Primary Key' in text or 'PK' in text:
+                    pk_col_index = i
+                    break
+
+            for row in column_table['rows']:
+                cells = row['cells']
+                if len(cells) >= 4 and cells[0].isdigit():
+                    column_name = cells[1]
+                    is_primary_key = 'N'
+
+                    # Method 1: Check for a primary key column
+                    if 0 <= pk_col_index < len(cells):
+                        if cells[pk_col_index].upper() in ['Y', 'YES', 'TRUE', '1', 'PK']:
+                            is_primary_key = 'Y'
+
+                    # Method 2: Check for PK indicator in the column name or description
+                    if is_primary_key == 'N':
+                        if column_name.endswith('_ID') or 'KEY' in column_name.upper() or 'PK' in column_name.upper():
+                            is_primary_key = 'Y'
+                        row_text = row['text'].upper()
+                        if 'PRIMARY KEY' in row_text or 'PK:' in row_text or ' PK ' in row_text:
+                            is_primary_key = 'Y'
+
+                    if is_primary_key == 'Y':
+                        primary_key_data.append({
+                            'table_name': table_name,
+                            'column_name': column_name,
+                            'is_primary_key': is_primary_key,
+                            'ordinal_position': cells[0]
+                        })
+
+    return primary_key_data
@@ -1,7 +1,7 @@
-from playwright.sync_api import sync_playwright
 import os
 
 def capture_page_info():
+    from playwright.sync_api import sync_playwright
     with sync_playwright() as p:
         # Launch a browser instance
         browser = p.chromium.launch(headless=False)  # Use headless=False to see the browser